@@ -0,0 +1,45 @@
+import sys
+import numpy as np
+sys.path.append('..')
+from utils import framestorelib, pcaplib
+
+DESCRIPTIONS = {"src": "send by", "dst": "received by", "ethertype": "with ethertype"}
+
+
+def query(source, key="src", value="bytes", start=None, end=None):
+    """Prints the totals of a group by, optionally in a window of seconds from the first frame."""
+    store = framestorelib.open_store(source)
+    mask = None
+    if start is not None:
+        timestamps = store["timestamp"]
+        if len(store) == 0 or np.isnan(timestamps).all():
+            raise framestorelib.FrameStoreException(f"{source} has no timestamps")
+        first = float(np.nanmin(timestamps))
+        mask = store.select(start=first + start, end=first + end)
+    results = store.group_by(key, value, mask)
+    for k, v in sorted(results.items(), key=lambda x: x[1], reverse=True):
+        label = f"0x{k:04x}" if key == "ethertype" else k
+        print(f"{v} {value} {DESCRIPTIONS[key]} {label}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <Capture or tshark dump> [src|dst|ethertype [bytes|frames [<From> <To>]]]")
+        print("The first time the file is converted into a columnar store (next to it, with extension .frames) which")
+        print("is reused until the file changes. From and To are seconds since the first frame.")
+        exit(-1)
+
+    key = sys.argv[2] if len(sys.argv) > 2 else "src"
+    value = sys.argv[3] if len(sys.argv) > 3 else "bytes"
+    start = end = None
+    if len(sys.argv) > 4:
+        try:
+            start, end = float(sys.argv[4]), float(sys.argv[5])
+        except (IndexError, ValueError):
+            print("The window should be two numbers of seconds")
+            exit(-1)
+    try:
+        query(sys.argv[1], key, value, start, end)
+    except (framestorelib.FrameStoreException, pcaplib.PcapException) as e:
+        print(e)
+        exit(-1)
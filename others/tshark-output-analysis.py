@@ -1,24 +1,93 @@
 import sys
+import json
+sys.path.append('..')
+from utils import pcaplib, tsharklib
 
+DESCRIPTIONS = {"src-bytes": "bytes send by", "src-frames": "frames send by",
+                "dst-bytes": "bytes received by", "dst-frames": "frames received by"}
+
+
+def analyze_file(filename, aggregation="src-bytes", k=None, workers=None):
+    try:
+        # Captures are read directly, without exporting them with tshark first
+        capture = pcaplib.is_capture(filename)
+        if capture:
+            results, malformed = pcaplib.aggregate(filename, aggregation)
+        else:
+            results, malformed = tsharklib.aggregate_file(filename, aggregation, workers)
+    except (OSError, pcaplib.PcapException) as e:
+        print(e)
+        return
+    for mac, v in tsharklib.top(results, k):
+        print(f"{v} {DESCRIPTIONS[aggregation]} {mac}")
+    if malformed:
+        print(f"{malformed} {'frames without Ethernet header' if capture else 'malformed lines'} were skipped")
+
+
+def follow(filename, key="src", interval=5, window=60, k=10):
+    """Follows tshark -l output (stdin with -) or a growing file, writing a JSON snapshot per interval."""
+    aggregate = tsharklib.LiveAggregate(key, window=window)
+
+    def emit(snapshot):
+        snapshot["top"] = snapshot["top"][:k]
+        snapshot["window top"] = snapshot["window top"][:k]
+        print(json.dumps(snapshot), flush=True)
 
-def analyze_file(filename):
     try:
-        results = {}
-        f = open(filename)
-        for l in f.readlines():
-            v = l.split()
-            results[v[1]] = results.get(v[1], 0) + int(v[2])
-        results = sorted(results.items(), key=lambda x: x[1], reverse=True)
-        for k, v in results:
-            print(f"{v} bytes send by {k}")
-        f.close()
-    except:
-        print(f"{filename} doesn't found")
+        if filename == "-":
+            tsharklib.follow(sys.stdin, aggregate, interval, emit)
+        else:
+            with open(filename, errors="replace") as f:
+                tsharklib.follow(f, aggregate, interval, emit, tail=True)
+    except KeyboardInterrupt:
+        emit(aggregate.snapshot())
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print(f"Usage: {sys.argv[0]} <datafile>")
+        print(f"Usage: {sys.argv[0]} <datafile> [<Aggregation> [<Top k> [<Workers>]]]")
+        print(f"       {sys.argv[0]} -f <datafile|-> [src|dst [<Interval> [<Window> [<Top k>]]]]")
         print("datafile is a file with multiple lines. Each line format is target mac, source mac, frame length.")
+        print("It can also be a pcapng or pcap capture, which is analyzed without exporting it with tshark.")
+        print(f"Aggregation is one of {', '.join(tsharklib.AGGREGATIONS)} (src-bytes by default); big files are")
+        print("processed in parallel by as many workers as cores unless another number is given.")
+        print("With -f the file (or stdin with -) is followed while tshark -l writes it and every interval seconds")
+        print("(5 by default) the top MACs so far and in the last window seconds (60 by default) are written as JSON.")
+    elif sys.argv[1] == "-f":
+        if len(sys.argv) < 3:
+            print("The file to follow (or - for stdin) is missing")
+            exit(-1)
+        key = sys.argv[3] if len(sys.argv) > 3 else "src"
+        if key not in ("src", "dst"):
+            print("Frames can be aggregated by src or dst")
+            exit(-1)
+        try:
+            interval = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+            window = float(sys.argv[5]) if len(sys.argv) > 5 else 60
+            k = int(sys.argv[6]) if len(sys.argv) > 6 else 10
+        except ValueError:
+            print("The interval, the window and top k should be numbers")
+            exit(-1)
+        if interval <= 0 or window <= 0 or k < 1:
+            print("The interval, the window and top k should be greater than 0")
+            exit(-1)
+        try:
+            follow(sys.argv[2], key, interval, window, k)
+        except OSError as e:
+            print(e)
+            exit(-1)
     else:
-        analyze_file(sys.argv[1])
+        aggregation = sys.argv[2] if len(sys.argv) > 2 else "src-bytes"
+        if aggregation not in tsharklib.AGGREGATIONS:
+            print(f"Aggregation should be one of {', '.join(tsharklib.AGGREGATIONS)}")
+            exit(-1)
+        try:
+            k = int(sys.argv[3]) if len(sys.argv) > 3 else None
+            workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        except ValueError:
+            print("Top k and the number of workers should be numbers")
+            exit(-1)
+        if (k is not None and k < 1) or (workers is not None and workers < 1):
+            print("Top k and the number of workers should be greater than 0")
+            exit(-1)
+        analyze_file(sys.argv[1], aggregation, k, workers)
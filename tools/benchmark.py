@@ -0,0 +1,53 @@
+import sys
+import random
+sys.path.append('..')
+from utils import benchlib
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "dump":
+        if len(sys.argv) < 4:
+            print(f"Usage: {sys.argv[0]} dump <Output file> <Size (MB)>")
+            exit(-1)
+        try:
+            with open(sys.argv[2], "w") as f:
+                lines = benchlib.write_field_dump(f, int(float(sys.argv[3]) * (1 << 20)), random.Random(0))
+            print(f"{lines} lines written to {sys.argv[2]}")
+        except (OSError, ValueError) as e:
+            print(e)
+        exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print(f"Usage: {sys.argv[0]} [<Scale> [<Results (json)> [<Baseline (json)> [<Benchmark names>...]]]]")
+        print(f"       {sys.argv[0]} dump <Output file> <Size (MB)>")
+        print("Use - to skip the results or the baseline file.")
+        print("Available benchmarks:")
+        for name in benchlib.BENCHMARKS:
+            print(f"    {name}")
+        exit(0)
+
+    try:
+        scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+        baseline = benchlib.load(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3] != "-" else None
+        results = benchlib.run(scale, sys.argv[4:], progress=lambda name: print(f"Running {name}...", file=sys.stderr))
+        if len(sys.argv) > 2 and sys.argv[2] != "-":
+            benchlib.save(results, sys.argv[2])
+        comparison = benchlib.compare(results, baseline) if baseline else []
+    except (OSError, ValueError) as e:
+        print(e)
+        exit(-1)
+    except benchlib.BenchmarkError as e:
+        print(e)
+        exit(-1)
+
+    print('{0:<36} {1:>10} {2:>12} {3:>12} {4:>8}'.format("benchmark", "size", "ops/sec", "peak (KB)", "scaling"))
+    for name, res in results["benchmarks"].items():
+        exponent = f"{res['scaling exponent']:.2f}" if res["scaling exponent"] is not None else "-"
+        print(f"{name:<36} {res['size']:>10} {res['ops/sec']:>12.1f} {res['peak memory'] / 1024:>12.1f} {exponent:>8}")
+
+    if comparison:
+        print()
+        print('{0:<36} {1:>12} {2:>12} {3:>8}'.format("benchmark", "baseline", "current", "ratio"))
+        for name, old, new, ratio, regression in comparison:
+            print(f"{name:<36} {old:>12.1f} {new:>12.1f} {ratio:>8.2f}{' REGRESSION' if regression else ''}")
+        if any(c[4] for c in comparison):
+            exit(1)
@@ -0,0 +1,29 @@
+import sys
+import json
+sys.path.append('..')
+from utils import flowanalysislib
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} <Protocol configuration (json)> <Frame loss probability> [<ACK loss probability> [<Replications to cross-check>]]")
+    else:
+        try:
+            with open(sys.argv[1]) as f:
+                config = json.load(f)
+            frame_loss = float(sys.argv[2])
+            ack_loss = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+            res = flowanalysislib.analyze(config, frame_loss, ack_loss)
+            print(f"Utilization: {float(res['utilization']):.4f}")
+            print(f"Throughput (frames per time unit): {float(res['throughput']):.4f}")
+            print(f"Expected transmissions per frame: {float(res['expected transmissions']):.4f}")
+            if len(sys.argv) > 4:
+                check = flowanalysislib.cross_check(config, frame_loss, ack_loss, int(sys.argv[4]))
+                print("Simulated:")
+                for k, v in check.items():
+                    # There is no relative error when the analytic value is 0
+                    error = "n/a" if v["relative error"] is None else f"{v['relative error']:.2%}"
+                    print(f"    {k}: {v['simulated']:.4f} (relative error {error})")
+        except (OSError, ValueError) as e:
+            print(e)
+        except flowanalysislib.AnalysisError as e:
+            print(e)
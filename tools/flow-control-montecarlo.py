@@ -0,0 +1,27 @@
+import sys
+import json
+sys.path.append('..')
+from utils import flowsweeplib
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} <Protocol configuration (json)> <Replications> [<Seed>]")
+    else:
+        try:
+            with open(sys.argv[1]) as f:
+                base = json.load(f)
+            seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+            stats = flowsweeplib.montecarlo(base, int(sys.argv[2]), seed)
+        except (OSError, ValueError) as e:
+            print(e)
+            exit(-1)
+        except flowsweeplib.SweepError as e:
+            print(e)
+            exit(-1)
+
+        print(f"Replications: {stats['replications']} ({stats['errors']} failed)")
+        print('{0:<16} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}'.format("metric", "mean", "p5", "p50", "p95", "p99"))
+        for k in flowsweeplib.MONTECARLO_FIELDS:
+            if stats[k] is not None:
+                v = stats[k]
+                print(f"{k:<16} {v['mean']:>10.4f} {v['p5']:>10.4f} {v['p50']:>10.4f} {v['p95']:>10.4f} {v['p99']:>10.4f}")
@@ -1,14 +1,42 @@
 import sys
+import json
 sys.path.append('..')
-from utils import flowcontrollib
+from utils import flowcontrollib, flowsweeplib
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print(f"Usage: {sys.argv[0]} <Protocol configuration (json)>")
+        print(f"Usage: {sys.argv[0]} <Protocol configuration (json)> [<Trace output (csv/jsonl)>]")
+        print(f"       {sys.argv[0]} <Protocol configuration (json)> <Parameter ranges (json)> <Output (csv/jsonl)>")
+    elif len(sys.argv) >= 4:
+        try:
+            with open(sys.argv[1]) as f:
+                base = json.load(f)
+            with open(sys.argv[2]) as f:
+                ranges = json.load(f)
+            runs = flowsweeplib.sweep(base, ranges, sys.argv[3])
+            print(f"{runs} simulations written to {sys.argv[3]}")
+        except (OSError, ValueError) as e:
+            print(e)
+        except flowsweeplib.SweepError as e:
+            print(e)
+    elif len(sys.argv) == 3:
+        if not (sys.argv[2].endswith(".csv") or sys.argv[2].endswith(".jsonl")):
+            print("The trace output file should be .csv or .jsonl")
+            exit(-1)
+        try:
+            prot = flowcontrollib.Protocol(sys.argv[1])
+            with open(sys.argv[2], "w", newline="") as f:
+                if sys.argv[2].endswith(".csv"):
+                    prot.run(flowcontrollib.CSVSink(f))
+                else:
+                    prot.run(flowcontrollib.JSONLinesSink(f))
+        except OSError as e:
+            print(e)
+        except flowcontrollib.ProtocolError as e:
+            print(e)
     else:
         try:
             prot = flowcontrollib.Protocol(sys.argv[1])
-            prot.run()
-            prot.write()
+            prot.run(flowcontrollib.TableSink())
         except flowcontrollib.ProtocolError as e:
             print(e)
@@ -1,14 +1,48 @@
 import sys
+import itertools
 sys.path.append('..')
 from utils import iplib
 
+# Addresses classified at once in file mode
+CHUNK = 65536
+
+
+def classify_file(f):
+    while True:
+        lines = list(itertools.islice(f, CHUNK))
+        if not lines:
+            break
+        ips = [line.strip() for line in lines if line.strip()]
+        classes, valid = iplib.classify(ips)
+        for ip, c, ok in zip(ips, classes, valid):
+            if ok:
+                print(f"{ip} is from class {c}")
+            else:
+                print(f"{ip} is not a valid IPv4 address")
+
 
 if __name__ == "__main__":
 
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <IP address>")
+        print(f"       {sys.argv[0]} -f <File with an IP address per line (- for stdin)>")
         exit(-1)
 
+    if sys.argv[1] == "-f":
+        try:
+            if len(sys.argv) < 3 or sys.argv[2] == "-":
+                classify_file(sys.stdin)
+            else:
+                with open(sys.argv[2]) as f:
+                    classify_file(f)
+        except OSError as e:
+            print(e)
+            exit(-1)
+        except iplib.IPAddressException as e:
+            print(e)
+            exit(-1)
+        exit(0)
+
     try:
         ip = iplib.IPAddress(sys.argv[1])
     except:
@@ -1,6 +1,25 @@
 import sys
+import csv
+import io
+import json
+import itertools
 sys.path.append('..')
-from utils import maclib
+from utils import maclib, ouilib, vendorlib
+
+FIELDS = ["mac", "vendor id", "vendor", "serial number", "administration", "type", "error"]
+# Lines processed (and written) at once in bulk mode
+CHUNK = 65536
+# Default number of concurrent requests and requests per second to the vendor API
+WORKERS = 8
+RATE = 2
+
+
+def address_type(mac):
+    if mac.is_unicast():
+        return "unicast"
+    elif mac.is_broadcast():
+        return "broadcast"
+    return "multicast"
 
 
 def print_report(mac):
@@ -15,24 +34,106 @@ def print_report(mac):
         print("This address is locally administered")
     else:
         print("This address is global")
-    print("This address is ",end="")
-    if mac.is_unicast():
-        print("unicast")
-    elif mac.is_broadcast():
-        print("broadcast")
-    else:
-        print("multicast")
+    print(f"This address is {address_type(mac)}")
+
+
+def analyze_chunk(lines, client, workers):
+    """Records of the MACs of a chunk. Vendors come from the local database; the OUIs it does not know
+    are asked once each, concurrently, to the API (unless client is None)."""
+    try:
+        database = ouilib.default_database()
+    except ouilib.OUIDatabaseException:
+        # A corrupted or truncated database is taken as no database, as in maclib
+        database = None
+    entries, pending = [], set()
+    for line in lines:
+        text = line.strip()
+        if not text:
+            continue
+        try:
+            mac = maclib.MACAddress(text)
+        except maclib.MACAddressException:
+            entries.append(({"mac": text, "error": "not a valid MAC"}, None))
+            continue
+        vendor = mac.get_vendor_name(online=False) if database is not None else None
+        record = {"mac": str(mac), "vendor id": mac.get_vendor_id(), "vendor": vendor,
+                  "serial number": mac.get_serial_number(),
+                  "administration": "local" if mac.is_local() else "global", "type": address_type(mac),
+                  "error": ""}
+        if vendor is None:
+            pending.add(record["vendor id"])
+        entries.append((record, vendor))
+
+    names, errors = client.lookup_many(pending, workers) if client is not None and pending else ({}, {})
+    records = []
+    for record, vendor in entries:
+        if vendor is None and "vendor id" in record:
+            record["vendor"] = names.get(record["vendor id"])
+            record["error"] = errors.get(record["vendor id"], "")
+        records.append(record)
+    return records
+
+
+def bulk(f, out, output_format, client, workers):
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, FIELDS)
+        writer.writeheader()
+    while True:
+        lines = list(itertools.islice(f, CHUNK))
+        if not lines:
+            break
+        records = analyze_chunk(lines, client, workers)
+        if output_format == "csv":
+            writer.writerows(records)
+            out.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            out.write("".join(json.dumps(record) + "\n" for record in records))
+    if output_format == "csv":
+        out.write(buffer.getvalue())
 
 
 if __name__ == "__main__":
 
-    if len(sys.argv) < 2:
+    if len(sys.argv) < 2 or (sys.argv[1] == "-f" and len(sys.argv) < 3):
         print(f"Usage: {sys.argv[0]} <MAC Address>")
-        print("\tA valid MAC address is composed by 6 groups (bytes) of two hexadecimal digits separated by :, . or -")
+        print(f"       {sys.argv[0]} -f <File with a MAC per line (- for stdin)> [csv|jsonl] [<Workers> [<Requests per second>]]")
+        print("\tA valid MAC address is composed by 6 groups (bytes) of two hexadecimal digits separated by :, . or -,")
+        print("\t3 groups of four hexadecimal digits separated by . (Cisco) or 12 hexadecimal digits")
+        print(f"\tIn bulk mode {WORKERS} workers ask the vendor API at most {RATE} times per second by default;"
+              " 0 workers disables the API and 0 requests per second removes the limit")
+    elif sys.argv[1] == "-f":
+        output_format = sys.argv[3] if len(sys.argv) > 3 else "csv"
+        if output_format not in ("csv", "jsonl"):
+            print("The output format should be csv or jsonl")
+            exit(-1)
+        try:
+            workers = int(sys.argv[4]) if len(sys.argv) > 4 else WORKERS
+            rate = float(sys.argv[5]) if len(sys.argv) > 5 else RATE
+        except ValueError:
+            print("The number of workers and the requests per second should be numbers")
+            exit(-1)
+        if workers < 0 or rate < 0:
+            print("The number of workers and the requests per second can not be negative")
+            exit(-1)
+        try:
+            client = None
+            if workers > 0:
+                client = vendorlib.VendorClient(vendorlib.default_cache(), pool_size=workers,
+                                                rate_limiter=vendorlib.RateLimiter(rate))
+            if sys.argv[2] == "-":
+                bulk(sys.stdin, sys.stdout, output_format, client, workers)
+            else:
+                with open(sys.argv[2]) as f:
+                    bulk(f, sys.stdout, output_format, client, workers)
+        except (OSError, vendorlib.VendorLookupException) as e:
+            print(e)
+            exit(-1)
     else:
         try:
             mac = maclib.MACAddress(sys.argv[1])
             print_report(mac)
         except maclib.MACAddressException:
             print(f"{sys.argv[1]} is not a valid MAC")
-
@@ -1,20 +1,92 @@
 import sys
+import csv
+import io
+import json
+import itertools
 sys.path.append('..')
 from utils import netlib
 
+FIELDS = ["ip", "mask", "network", "network id", "network mask", "prefix", "broadcast", "first host", "last host",
+          "number of hosts", "error"]
+# Lines processed (and written) at once in batch mode
+CHUNK = 8192
+
+
+def parse_mask(mask):
+    try:
+        return int(mask)
+    except Exception:
+        return mask
+
+
+def network_info(ip, mask):
+    try:
+        net = netlib.Network(ip, parse_mask(mask))
+    except netlib.NetworkException as e:
+        return {"ip": ip, "mask": mask, "error": str(e)}
+    return {"ip": ip, "mask": mask, "network": str(net), "network id": net.get_id(),
+            "network mask": net.get_metmask(), "prefix": net.prefix, "broadcast": net.get_broadcast(),
+            "first host": net.get_first_host_ip(), "last host": net.get_last_host_ip(),
+            "number of hosts": net.get_number_of_hosts(), "error": ""}
+
+
+def split_line(line):
+    """ip/mask, ip,mask or ip mask"""
+    for sep in ("/", ","):
+        if sep in line:
+            ip, mask = line.split(sep, 1)
+            return ip.strip(), mask.strip()
+    values = line.split()
+    return values[0], values[1] if len(values) > 1 else ""
+
+
+def batch(f, out, output_format):
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, FIELDS)
+        writer.writeheader()
+    while True:
+        lines = list(itertools.islice(f, CHUNK))
+        if not lines:
+            break
+        infos = [network_info(*split_line(line)) for line in lines if line.strip()]
+        # Every chunk is formatted in memory and written with a single call
+        if output_format == "csv":
+            writer.writerows(infos)
+            out.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            out.write("".join(json.dumps(info) + "\n" for info in infos))
+    if output_format == "csv":
+        out.write(buffer.getvalue())
+
 
 if __name__ == "__main__":
 
     if len(sys.argv) < 3:
         print(f"Usage: {sys.argv[0]} <IP address> <Mask (IP or Prefix)>")
+        print(f"       {sys.argv[0]} -f <File with IP/Mask per line (- for stdin)> [csv|jsonl]")
         exit(-1)
 
-    try:
+    if sys.argv[1] == "-f":
+        output_format = sys.argv[3] if len(sys.argv) > 3 else "csv"
+        if output_format not in ("csv", "jsonl"):
+            print("The output format should be csv or jsonl")
+            exit(-1)
         try:
-            mask = int(sys.argv[2])
-        except Exception:
-            mask = sys.argv[2]
-        net = netlib.Network(sys.argv[1], mask)
+            if sys.argv[2] == "-":
+                batch(sys.stdin, sys.stdout, output_format)
+            else:
+                with open(sys.argv[2]) as f:
+                    batch(f, sys.stdout, output_format)
+        except OSError as e:
+            print(e)
+            exit(-1)
+        exit(0)
+
+    try:
+        net = netlib.Network(sys.argv[1], parse_mask(sys.argv[2]))
         print(f"Network: {net}")
         print(f"- Network ID: {net.get_id()}")
         print(f"- Network Mask: {net.get_metmask()}")
@@ -1,63 +1,68 @@
-import sys, socket
+import sys, json
 sys.path.append('..')
-from utils import maclib
-
-try:
-	import psutil
-	option = 1
-except:
-	option = 2
-
-def get_ifaces_with_psutil():
-	addrs = psutil.net_if_addrs()
-	stats = psutil.net_if_stats()
-
-	for i in addrs:
-		for t in addrs[i]:
-			if t.family == socket.AF_INET:
-				ip = t.address
-				nm = t.netmask
-				bc = t.broadcast
-
-			if t.family == psutil.AF_LINK:
-				try:
-					mac = maclib.MACAddress(t.address)
-					print(f"{i}: {mac}", end =" ")
-
-					if mac.is_local():
-						print("- (local)", end =" ")
-					else:
-						print("- (global)", end =" ")
-
-					if stats[i].isup:
-						print("- up")
-					else:
-						print("- down")
-
-					print(f" IP: {ip}")
-					if ip != None:
-						print(f" Netmask: {nm}")
-						print(f" Broadcast: {bc}")				
-
-					if stats[i].duplex == psutil.NIC_DUPLEX_FULL:
-						print(" Duplex mode: FULL-DUPLEX")
-					elif stats[i].duplex == psutil.NIC_DUPLEX_HALF:
-						print(" Duplex mode: HALF-DUPLEX")
-					else:
-						print(" Duplex mode: Unknown")
-					print(f" Speed (MB/s): {stats[i].speed}")
-					print(f" MTU: {stats[i].mtu}")
-
-					print()
-					ip = None
-					break
-				except maclib.MACAddressException:
-					pass
+from utils import ifacelib, ifcounterlib
 
-if __name__ == "__main__":
-	if option == 1:
-		get_ifaces_with_psutil()
-	else:
-		print("netifaces or psutil modules are required")
+DUPLEX = {"full": "FULL-DUPLEX", "half": "HALF-DUPLEX"}
+
+def print_interfaces(inventory):
+	for record in inventory.interfaces():
+		mac = record["mac"]
+		if mac is None:
+			continue
+		print(f"{record['name']}: {mac}", end =" ")
+
+		if mac.is_local():
+			print("- (local)", end =" ")
+		else:
+			print("- (global)", end =" ")
+
+		if record["up"] is False:
+			print("- down")
+		else:
+			print("- up")
+
+		ip = record["ipv4"][0] if record["ipv4"] else None
+		print(f" IP: {ip['address'] if ip else None}")
+		if ip is not None:
+			print(f" Netmask: {ip['netmask']}")
+			print(f" Broadcast: {ip['broadcast']}")
 
+		print(f" Duplex mode: {DUPLEX.get(record['duplex'], 'Unknown')}")
+		print(f" Speed (MB/s): {record['speed'] if record['speed'] is not None else 0}")
+		print(f" MTU: {record['mtu']}")
 
+		print()
+
+def sample(interval, samples, interfaces):
+	sampler = ifcounterlib.CounterSampler(interfaces)
+
+	def emit(res):
+		sys.stdout.write("".join(json.dumps(r) + "\n" for r in ifcounterlib.to_records(res)))
+		sys.stdout.flush()
+
+	try:
+		sampler.run(interval, samples, emit)
+	except KeyboardInterrupt:
+		pass
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == "sample":
+		try:
+			interval = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+			samples = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+		except ValueError:
+			print(f"Usage: {sys.argv[0]} sample [<Interval (s)> [<Samples (0 for ever)> [<Interface>...]]]")
+			exit(-1)
+		if interval <= 0 or samples < 0:
+			print("The interval should be greater than 0 and the number of samples can not be negative")
+			exit(-1)
+		try:
+			sample(interval, samples or None, sys.argv[4:])
+		except (OSError, ifcounterlib.CounterException) as e:
+			print(e)
+			exit(-1)
+	else:
+		try:
+			print_interfaces(ifacelib.default_inventory())
+		except ifacelib.InterfaceException as e:
+			print(e)
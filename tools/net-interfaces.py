@@ -1,17 +1,6 @@
 import sys
 sys.path.append('..')
-from utils import maclib
-
-
-try:
-    import psutil
-    option = 1
-except:
-    try:
-        import netifaces
-        option = 2
-    except:
-        option = 3
+from utils import ifacelib
 
 
 def print_info(nic, mac, up):
@@ -23,41 +12,15 @@ def print_info(nic, mac, up):
     print(f") - {up}")
 
 
-def get_ifaces_with_netifaces():
-    netifs = netifaces.interfaces()
-
-    for nic in netifs:
-        info = netifaces.ifaddresses(nic).get(netifaces.AF_LINK)
-        if info:
-            try:
-                mac = maclib.MACAddress(info[0]['addr'])
-                print_info(nic, mac, "up")
-            except maclib.MACAddressException:
-                pass
+def print_interfaces(inventory):
+    for record in inventory.interfaces():
+        if record["mac"] is not None:
+            # netifaces does not know the state, those interfaces are shown as up
+            print_info(record["name"], record["mac"], "down" if record["up"] is False else "up")
 
 
-def get_ifaces_with_psutil():
-    stats = psutil.net_if_stats()
-    for nic, addrs in psutil.net_if_addrs().items():
-        for addr in addrs:
-            if addr.family == psutil.AF_LINK:
-                try:
-                    mac = maclib.MACAddress(addr.address)
-                    up = "up"
-                    if nic in stats:
-                        st = stats[nic]
-                        if not st.isup:
-                            up = "down"
-                    print_info(nic, mac, up)
-                    break
-                except maclib.MACAddressException:
-                    pass
-
 if __name__ == "__main__":
-    if option == 1:
-        get_ifaces_with_psutil()
-    elif option == 2:
-        get_ifaces_with_netifaces()
-    else:
-        print("netifaces or psutil modules are required")
-
+    try:
+        print_interfaces(ifacelib.default_inventory())
+    except ifacelib.InterfaceException as e:
+        print(e)
@@ -0,0 +1,48 @@
+import sys
+sys.path.append('..')
+from utils import netsetlib
+
+
+def read_set(filename):
+    if filename == "-":
+        return netsetlib.NetworkSet.from_file(sys.stdin)
+    with open(filename) as f:
+        return netsetlib.NetworkSet.from_file(f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} summarize <Network list>...")
+        print(f"       {sys.argv[0]} union|intersection|difference <Network list> <Network list>")
+        print(f"       {sys.argv[0]} contains <Network list> <IP address or network>...")
+        print("Network lists have a network per line (ip/prefix, ip/mask, ip mask or ip); - reads stdin.")
+        exit(-1)
+
+    command = sys.argv[1]
+    try:
+        if command == "summarize":
+            res = read_set(sys.argv[2])
+            for filename in sys.argv[3:]:
+                res = res | read_set(filename)
+        elif command in ("union", "intersection", "difference"):
+            if len(sys.argv) < 4:
+                print(f"{command} needs two network lists")
+                exit(-1)
+            res = getattr(read_set(sys.argv[2]), command)(read_set(sys.argv[3]))
+        elif command == "contains":
+            res = read_set(sys.argv[2])
+            for item in sys.argv[3:]:
+                print(f"{item}: {'yes' if item in res else 'no'}")
+            exit(0)
+        else:
+            print(f"Unknown command {command}")
+            exit(-1)
+    except OSError as e:
+        print(e)
+        exit(-1)
+    except netsetlib.NetworkSetException as e:
+        print(e)
+        exit(-1)
+
+    for cidr in res.cidrs():
+        print(cidr)
@@ -0,0 +1,36 @@
+import os
+import sys
+sys.path.append('..')
+from utils import maclib, ouilib
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "lookup"):
+        print(f"Usage: {sys.argv[0]} import <IEEE registry file (txt or csv)>...")
+        print(f"       {sys.argv[0]} lookup <MAC Address>...")
+        print(f"The database is stored in {ouilib.DEFAULT_DATABASE}")
+        exit(-1)
+
+    if sys.argv[1] == "import":
+        try:
+            os.makedirs(os.path.dirname(ouilib.DEFAULT_DATABASE), exist_ok=True)
+            blocks = ouilib.build(sys.argv[2:], ouilib.DEFAULT_DATABASE)
+        except OSError as e:
+            print(e)
+            exit(-1)
+        print(f"{blocks} blocks written to {ouilib.DEFAULT_DATABASE}")
+    else:
+        try:
+            database = ouilib.default_database()
+        except ouilib.OUIDatabaseException as e:
+            print(e)
+            exit(-1)
+        if database is None:
+            print(f"There is no vendor database, build it with: {sys.argv[0]} import <IEEE registry file>...")
+            exit(-1)
+        for arg in sys.argv[2:]:
+            try:
+                mac = maclib.MACAddress(arg)
+            except maclib.MACAddressException:
+                print(f"{arg} is not a valid MAC")
+                continue
+            print(f"{mac}: {mac.get_vendor_name(online=False) or 'Unknown'}")
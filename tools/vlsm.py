@@ -0,0 +1,86 @@
+import sys
+import json
+sys.path.append('..')
+from utils import netlib, vlsmlib
+
+
+def parse_segments(args, plan):
+    """Segments are given as name=hosts or just hosts (named with the first S1, S2... not taken by the
+    plan or the other arguments)."""
+    res = []
+    taken = set(plan.segments) if plan else set()
+    taken.update(arg.rsplit("=", 1)[0] for arg in args if "=" in arg)
+    n = 0
+    for arg in args:
+        if "=" in arg:
+            name, hosts = arg.rsplit("=", 1)
+        else:
+            n += 1
+            while f"S{n}" in taken:
+                n += 1
+            name, hosts = f"S{n}", arg
+            taken.add(name)
+        res.append((name, int(hosts)))
+    return res
+
+
+def print_plan(plan):
+    print(f"Network: {plan.parent} ({plan.free_addresses()} free addresses)")
+    print('{0:<12} {1:>8} {2:<18} {3:<15} {4:<15} {5:<15} {6:<15}'.format(
+        "segment", "hosts", "network", "mask", "broadcast", "first host", "last host"))
+    for name, (hosts, net) in sorted(plan.segments.items(), key=lambda s: s[1][1].netid):
+        print(f"{name:<12} {hosts:>8} {str(net):<18} {net.get_metmask():<15} {net.get_broadcast():<15} "
+              f"{net.get_first_host_ip():<15} {net.get_last_host_ip():<15}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <IP address> <Mask (IP or Prefix)> <Segment (hosts or name=hosts)>...")
+        print(f"       {sys.argv[0]} <Plan (json)> create <IP address> <Mask (IP or Prefix)> <Segment>...")
+        print(f"       {sys.argv[0]} <Plan (json)> add <Segment>...")
+        print(f"       {sys.argv[0]} <Plan (json)> release <Segment name>...")
+        print(f"       {sys.argv[0]} <Plan (json)>")
+        exit(-1)
+
+    try:
+        filename = None
+        if sys.argv[1].endswith(".json"):
+            filename = sys.argv[1]
+            command = sys.argv[2] if len(sys.argv) > 2 else "show"
+            args = sys.argv[3:]
+        else:
+            command, args = "create", sys.argv[1:]
+
+        if command == "create":
+            if len(args) < 3:
+                raise vlsmlib.VLSMException("The network, the mask and at least one segment are needed")
+            try:
+                mask = int(args[1])
+            except ValueError:
+                mask = args[1]
+            plan = vlsmlib.plan(netlib.Network(args[0], mask), parse_segments(args[2:], None))
+        else:
+            with open(filename) as f:
+                plan = vlsmlib.VLSMPlan.from_dict(json.load(f))
+            if command == "add":
+                for name, hosts in parse_segments(args, plan):
+                    plan.add(name, hosts)
+            elif command == "release":
+                for name in args:
+                    plan.release(name)
+            elif command != "show":
+                raise vlsmlib.VLSMException(f"Unknown command {command} (create, add or release)")
+
+        if filename:
+            with open(filename, "w") as f:
+                json.dump(plan.to_dict(), f, indent=2)
+        print_plan(plan)
+    except (OSError, ValueError) as e:
+        print(e)
+        exit(-1)
+    except netlib.NetworkException as e:
+        print(e)
+        exit(-1)
+    except vlsmlib.VLSMException as e:
+        print(e)
+        exit(-1)
@@ -0,0 +1,276 @@
+import sys
+import os
+import gc
+import math
+import time
+import json
+import random
+import platform
+import tempfile
+import importlib
+import tracemalloc
+import contextlib
+sys.path.append('..')
+from utils import flowcontrollib, iplib, netlib, maclib
+
+
+# Sizes of every scaling curve, multiplied by the scale of the run
+STEPS = [1, 2, 4, 8]
+# A benchmark is a regression when it is this fraction slower than its baseline
+TOLERANCE = 0.2
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+# Synthetic inputs
+
+def random_ips(n, rng):
+    return [f"{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+            for _ in range(n)]
+
+
+def random_macs(n, rng, separators=":-."):
+    res = []
+    for _ in range(n):
+        sep = rng.choice(separators)
+        res.append(sep.join(f"{rng.randrange(256):02x}" for _ in range(6)))
+    return res
+
+
+def random_config(protocol, frames, window=None, loss=0.01, rng=None):
+    """Configuration for the flow-control simulator with a fixed fraction of frames and ACKs lost."""
+    rng = rng or random.Random()
+    config = {"protocol": protocol, "number of frames": frames,
+              "frames lost": sorted(rng.sample(range(1, frames + 1), int(frames * loss))),
+              "acks lost": sorted(rng.sample(range(1, frames + 1), int(frames * loss)))}
+    if protocol == "Stop & Wait":
+        config["bit for numbering"] = 1
+    else:
+        window = window or 4
+        # Selective Repeat needs a window of at most half the numbers
+        config["bit for numbering"] = max(1, (2 * window - 1).bit_length())
+        config["sender window"] = window
+    return config
+
+
+def write_field_dump(f, size, rng, stations=64):
+    """Writes lines like the ones tshark exports (destination, source and frame length separated by tabs)
+    until size bytes are written. It works line by line, so it can generate dumps of several GB.
+    Returns the number of lines."""
+    macs = random_macs(stations, rng, ":")
+    destinations = macs + ["ff:ff:ff:ff:ff:ff", "01:80:c2:00:00:00"]
+    written = 0
+    lines = 0
+    while written < size:
+        block = "".join(f"{rng.choice(destinations)}\t{rng.choice(macs)}\t{rng.randint(60, 1514)}\n"
+                        for _ in range(1024))
+        f.write(block)
+        written += len(block)
+        lines += 1024
+    return lines
+
+
+# Measurement
+
+def measure(func, repeat=5):
+    """Best time of repeat calls to func (without tracing) and the peak of memory allocated by one call."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def scaling_exponent(curve):
+    """Slope of log(time) against log(size): 1 means linear, 2 quadratic..."""
+    points = [(math.log(p["size"]), math.log(p["seconds"])) for p in curve if p["seconds"] > 0]
+    if len(points) < 2:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    den = sum((x - mx) ** 2 for x, _ in points)
+    return sum((x - mx) * (y - my) for x, y in points) / den if den else None
+
+
+def run_curve(sizes, prepare, repeat=5):
+    """prepare(size) returns (function to measure, operations done by one call). The result keeps the
+    largest point as the figure of the benchmark and every point as its scaling curve."""
+    curve = []
+    for size in sizes:
+        func, ops = prepare(size)
+        seconds, peak = measure(func, repeat)
+        curve.append({"size": size, "ops": ops, "seconds": seconds,
+                      "ops/sec": ops / seconds if seconds else None, "peak memory": peak})
+    res = dict(curve[-1])
+    res["curve"] = curve
+    res["scaling exponent"] = scaling_exponent(curve)
+    return res
+
+
+# Benchmarks. Each one receives the scale and a random generator and returns a result of run_curve
+
+def bench_protocol_frames(protocol):
+    def bench(scale, rng):
+        def prepare(frames):
+            config = flowcontrollib.ProtocolConfig(random_config(protocol, frames, 8, rng=rng))
+
+            def func():
+                flowcontrollib.Protocol.from_config(config).run(flowcontrollib.NullSink())
+            return func, frames
+        return run_curve([500 * scale * s for s in STEPS], prepare)
+    return bench
+
+
+def bench_protocol_window(protocol):
+    def bench(scale, rng):
+        frames = 2000 * scale
+
+        def prepare(window):
+            config = flowcontrollib.ProtocolConfig(random_config(protocol, frames, window, rng=rng))
+
+            def func():
+                flowcontrollib.Protocol.from_config(config).run(flowcontrollib.NullSink())
+            return func, frames
+        return run_curve([4 * s for s in STEPS], prepare)
+    return bench
+
+
+def bench_ip_address(scale, rng):
+    def prepare(n):
+        ips = random_ips(n, rng)
+
+        def func():
+            for ip in ips:
+                iplib.IPAddress(ip).get_class()
+        return func, n
+    return run_curve([5000 * scale * s for s in STEPS], prepare)
+
+
+def bench_ip_classify(scale, rng):
+    def prepare(n):
+        ips = random_ips(n, rng)
+
+        def func():
+            iplib.classify(ips)
+        return func, n
+    return run_curve([50000 * scale * s for s in STEPS], prepare)
+
+
+def bench_network(scale, rng):
+    def prepare(n):
+        nets = [(ip, rng.randint(8, 30)) for ip in random_ips(n, rng)]
+
+        def func():
+            for ip, prefix in nets:
+                netlib.Network(ip, prefix).get_broadcast()
+        return func, n
+    return run_curve([2000 * scale * s for s in STEPS], prepare)
+
+
+def bench_mac_address(scale, rng):
+    def prepare(n):
+        macs = random_macs(n, rng)
+
+        def func():
+            for mac in macs:
+                maclib.MACAddress(mac).is_multicast()
+        return func, n
+    return run_curve([5000 * scale * s for s in STEPS], prepare)
+
+
+def bench_mac_fields(scale, rng):
+    def prepare(n):
+        macs = random_macs(n, rng)
+
+        def func():
+            maclib.get_fields(maclib.to_numbers(macs)[0])
+        return func, n
+    return run_curve([50000 * scale * s for s in STEPS], prepare)
+
+
+def bench_tshark_analysis(scale, rng):
+    analysis = importlib.import_module("others.tshark-output-analysis")
+    with tempfile.TemporaryDirectory() as tmp:
+        def prepare(size):
+            filename = os.path.join(tmp, f"dump-{size}.txt")
+            with open(filename, "w") as f:
+                lines = write_field_dump(f, size, rng)
+
+            def func():
+                with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+                    analysis.analyze_file(filename)
+            return func, lines
+        res = run_curve([(1 << 20) * scale * s for s in STEPS], prepare)
+    # Sizes are in bytes, so this is the speed reading the dump
+    res["bytes/sec"] = res["size"] / res["seconds"] if res["seconds"] else None
+    return res
+
+
+BENCHMARKS = {"protocol frames (Stop & Wait)": bench_protocol_frames("Stop & Wait"),
+              "protocol frames (Go-Back-N)": bench_protocol_frames("Go-Back-N"),
+              "protocol frames (Selective Repeat)": bench_protocol_frames("Selective Repeat"),
+              "protocol window (Go-Back-N)": bench_protocol_window("Go-Back-N"),
+              "protocol window (Selective Repeat)": bench_protocol_window("Selective Repeat"),
+              "ip address": bench_ip_address,
+              "ip classify (batch)": bench_ip_classify,
+              "network": bench_network,
+              "mac address": bench_mac_address,
+              "mac fields (batch)": bench_mac_fields,
+              "tshark analysis": bench_tshark_analysis}
+
+
+def run(scale=1, names=None, seed=0, progress=None):
+    """Runs the benchmarks whose name contains any of names (all by default). Inputs are generated from
+    seed, so two runs with the same scale measure the same work."""
+    if scale < 1:
+        raise BenchmarkError("The scale should be greater than 0")
+    selected = [k for k in BENCHMARKS if not names or any(n in k for n in names)]
+    if not selected:
+        raise BenchmarkError(f"There are no benchmarks matching {', '.join(names)}")
+    results = {"scale": scale, "seed": seed, "python": platform.python_version(),
+               "machine": platform.machine(), "benchmarks": {}}
+    for name in selected:
+        if progress:
+            progress(name)
+        results["benchmarks"][name] = BENCHMARKS[name](scale, random.Random(seed))
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Compares the ops/sec of every benchmark present in both runs. Returns a list of
+    (name, baseline ops/sec, current ops/sec, ratio, is regression)."""
+    if results["scale"] != baseline.get("scale"):
+        raise BenchmarkError("The baseline was measured with a different scale")
+    res = []
+    for name, current in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None or not old.get("ops/sec") or not current["ops/sec"]:
+            continue
+        ratio = current["ops/sec"] / old["ops/sec"]
+        res.append((name, old["ops/sec"], current["ops/sec"], ratio, ratio < 1 - tolerance))
+    return res
+
+
+def save(results, filename):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise BenchmarkError(f"The baseline {filename} can not be read ({e})")
@@ -0,0 +1,99 @@
+import sys
+import numpy as np
+sys.path.append('..')
+from utils import flowcontrollib, flowsweeplib
+
+
+class AnalysisError(Exception):
+    pass
+
+
+def cycle_time(tt, tp, proc, at, ap):
+    """Time from the start of a frame until its ACK is received."""
+    return np.asarray(tt) + tp + proc + at + ap
+
+
+def attempt_loss(frame_loss, ack_loss=0):
+    """Probability that a transmission has to be repeated (the frame or its ACK is lost)."""
+    return 1 - (1 - np.asarray(frame_loss, dtype=float)) * (1 - np.asarray(ack_loss, dtype=float))
+
+
+def utilization(protocol, window, frame_loss, ack_loss=0, tt=1, tp=1, proc=0.5, at=0.5, ap=1, timeout=12):
+    """Fraction of time the sender spends transmitting new frames. Every parameter but protocol can be a
+    numpy array and the result follows numpy broadcasting.
+
+    Stop & Wait pays a whole timeout for every lost attempt. Go-Back-N and Selective Repeat use the usual
+    formulas with k = cycle time / transmission time, i.e. 1 + 2a when processing and ACKs are negligible:
+        Go-Back-N:         n (1 - P) / (k (1 + (n - 1) P))  if W >= k,  W (1 - P) / (k (1 - P + W P))  otherwise
+        Selective Repeat:  n (1 - P) / k                    if W >= k,  W (1 - P) / k                  otherwise
+    n is ceil(k): the simulator sends a pending frame as soon as an ACK arrives, even while another frame is
+    being transmitted, so a full window fits n frames in every cycle (with an integer k it is the usual
+    formula). These ignore the time the window is stalled waiting for a retransmission, so with losses they
+    are upper bounds of what the simulator obtains.
+    """
+    tt = np.asarray(tt, dtype=float)
+    if np.any(tt <= 0):
+        raise AnalysisError("The frame transmission time should be greater than 0")
+    p = attempt_loss(frame_loss, ack_loss)
+    if np.any((p < 0) | (p >= 1)):
+        raise AnalysisError("Loss probabilities should be in [0, 1)")
+    cycle = cycle_time(tt, tp, proc, at, ap)
+    k = cycle / tt
+    # Frames that fit in a cycle (the tolerance keeps integer ratios from being rounded up)
+    n = np.ceil(k - 1e-9)
+    w = np.asarray(window, dtype=float)
+
+    if protocol == "Stop & Wait":
+        return tt / (cycle + p / (1 - p) * (tt + np.asarray(timeout)))
+    elif protocol == "Go-Back-N":
+        full = n * (1 - p) / (k * (1 + (n - 1) * p))
+        partial = w * (1 - p) / (k * (1 - p + w * p))
+    elif protocol == "Selective Repeat":
+        full = n * (1 - p) / k
+        partial = w * (1 - p) / k
+    else:
+        raise AnalysisError(f"The selected protocol ({protocol}) is no valid.")
+    return np.where(w >= k, full, partial)
+
+
+def analyze(config, frame_loss, ack_loss=0):
+    """Utilization, throughput (frames per time unit) and expected transmissions per frame of a
+    configuration with the flow-control simulator schema."""
+    try:
+        config = flowcontrollib.ProtocolConfig(config)
+    except flowcontrollib.ProtocolError as e:
+        raise AnalysisError(str(e))
+    c = config.configuration
+    u = utilization(c["protocol"], config.sender_window_size, frame_loss, ack_loss,
+                    c["frame transmission time"], c["frame propagation time"], c["processing time"],
+                    c["ack transmission time"], c["ack propagation time"], c["timeout"])
+    return {"utilization": u,
+            "throughput": u / c["frame transmission time"],
+            "expected transmissions": 1 / (1 - attempt_loss(frame_loss, ack_loss))}
+
+
+def cross_check(config, frame_loss, ack_loss=0, replications=20, seed=None):
+    """Compares analyze() with Monte-Carlo runs of the simulator using Bernoulli losses. Long transfers
+    should be used so that the start and the end of the transfer do not weigh in the simulation. Unlike
+    the other functions it only takes scalar probabilities (numpy scalars are converted to float)."""
+    try:
+        frame_loss, ack_loss = float(frame_loss), float(ack_loss)
+    except (TypeError, ValueError):
+        raise AnalysisError("cross_check takes a single frame and ACK loss probability, not arrays")
+    expected = analyze(config, frame_loss, ack_loss)
+    base = dict(config)
+    base["frames loss model"] = {"model": "bernoulli", "probability": frame_loss}
+    base["acks loss model"] = {"model": "bernoulli", "probability": ack_loss}
+    try:
+        stats = flowsweeplib.montecarlo(base, replications, seed)
+    except flowsweeplib.SweepError as e:
+        raise AnalysisError(str(e))
+    if stats["efficiency"] is None:
+        raise AnalysisError("Every simulation failed")
+    res = {}
+    for name, metric in [("utilization", "efficiency"), ("throughput", "throughput")]:
+        simulated = stats[metric]["mean"]
+        analytic = float(expected[name])
+        res[name] = {"analytic": analytic, "simulated": simulated,
+                     "relative error": abs(simulated - analytic) / analytic if analytic else None}
+    return res
@@ -1,5 +1,11 @@
+import sys
+from collections import deque, namedtuple
 from enum import IntEnum
+import csv
+import heapq
 import json
+sys.path.append('..')
+from utils import losslib
 
 
 class Event(IntEnum):
@@ -14,66 +20,187 @@ class Event(IntEnum):
     TRANS_NACK_END = 9
 
 
+# Events that decide when the next frame can be sent
+SENDER_EVENTS = (Event.TIMEOUT, Event.RECEIVE_ACK, Event.RECEIVE_NACK)
+
+
 class EventQueue:
+    """Pending events ordered by (time, type), ties resolved by insertion order.
+
+    Events live in a binary heap. add_event places an event behind every pending
+    one and add_event_front ahead of all of them, so each event gets a position
+    key that never changes. SEND_FRAME events are kept apart because they are
+    retimed all together: the ones sharing the last retime wait in a heap by
+    position, the ones added later wait in a heap by (time, position). The
+    initial SEND_FRAME of every frame is not stored, add_frames keeps them as a
+    range. Cancelled events are only marked and dropped when they reach the top.
+    """
+
     def __init__(self):
-        self.queue = []
+        self.heap = []
+        self.back = 0
+        self.front = 0
+        self.send_time = None
+        self.send_bulk = []
+        self.send_new = []
+        self.timeouts = {}
+        # Pending TRANS_FRAME_END events in insertion order; the ones already done are dropped from the front
+        self.trans_frame_end = deque()
+        self.sender_events = []
+        self.sender_live = 0
+        self.frames_next = 0
+        self.frames_end = 0
+        self.frames_position = 0
+
+    def __position(self, front):
+        if front:
+            self.front -= 1
+            return self.front
+        self.back += 1
+        return self.back
+
+    def __push(self, event_type, time, seq_number, front):
+        # [time, type, position, seq_number, alive]
+        ev = [time, event_type, self.__position(front), seq_number, True]
+        if event_type == Event.SEND_FRAME:
+            heapq.heappush(self.send_new, ev)
+            return
+        heapq.heappush(self.heap, ev)
+        if event_type == Event.TIMEOUT:
+            self.timeouts.setdefault(seq_number, []).append(ev)
+        elif event_type == Event.TRANS_FRAME_END:
+            self.__prune_transmissions()
+            self.trans_frame_end.append(ev)
+        if event_type in SENDER_EVENTS:
+            heapq.heappush(self.sender_events, (-time, ev))
+            self.sender_live += 1
+
+    def __sender_event_done(self):
+        self.sender_live -= 1
+        # Dead entries only leave the heap from the top, so rebuild it when they dominate
+        if len(self.sender_events) > 64 and len(self.sender_events) > 4 * self.sender_live:
+            self.sender_events = [x for x in self.sender_events if x[1][4]]
+            heapq.heapify(self.sender_events)
+
+    def add_frames(self, n):
+        """Same as add_event(Event.SEND_FRAME, 0, i) for i in range(n)."""
+        if self.send_time is None:
+            self.send_time = 0
+        self.frames_next = 0
+        self.frames_end = n
+        self.frames_position = self.back + 1
+        self.back += n
 
     def add_event(self, event_type, time, seq_number):
-        ev = {"type": event_type, "time": time, "seq_number": seq_number}
-        self.queue.append(ev)
+        self.__push(event_type, time, seq_number, False)
 
     def add_event_front(self, event_type, time, seq_number):
-        ev = {"type": event_type, "time": time, "seq_number": seq_number}
-        self.queue = [ev] + self.queue
+        self.__push(event_type, time, seq_number, True)
+
+    def __next_send(self):
+        best = None
+        if self.frames_next < self.frames_end:
+            best = (self.send_time, Event.SEND_FRAME, self.frames_position + self.frames_next, None)
+        if self.send_bulk and (best is None or self.send_bulk[0][0] < best[2]):
+            ev = self.send_bulk[0][1]
+            best = (self.send_time, Event.SEND_FRAME, ev[2], ev)
+        if self.send_new:
+            ev = self.send_new[0]
+            if best is None or (ev[0], ev[2]) < (best[0], best[2]):
+                best = (ev[0], Event.SEND_FRAME, ev[2], ev)
+        return best
 
     def next_event(self):
-        if self.queue is None or len(self.queue) == 0:
-            return None
-
-        pos_ev = 0
-        for x in range(1, len(self.queue)):
-            if self.queue[pos_ev]["time"] > self.queue[x]["time"]:
-                pos_ev = x
-            elif self.queue[pos_ev]["time"] == self.queue[x]["time"]:
-                if self.queue[pos_ev]["type"] > self.queue[x]["type"]:
-                    pos_ev = x
+        heap = self.heap
+        while heap and not heap[0][4]:
+            heapq.heappop(heap)
+
+        send = self.__next_send()
+        if send is not None and (not heap or (send[0], send[1]) < (heap[0][0], heap[0][1])):
+            ev = send[3]
+            if ev is None:
+                self.frames_next += 1
+                return {"type": Event.SEND_FRAME, "time": send[0], "seq_number": self.frames_next - 1}
+            if self.send_bulk and self.send_bulk[0][1] is ev:
+                heapq.heappop(self.send_bulk)
+            else:
+                heapq.heappop(self.send_new)
+            return {"type": Event.SEND_FRAME, "time": send[0], "seq_number": ev[3]}
 
-        ev = self.queue[pos_ev]
-        del self.queue[pos_ev]
-        return ev
+        if not heap:
+            return None
+        ev = heapq.heappop(heap)
+        ev[4] = False
+        if ev[1] == Event.TIMEOUT:
+            self.__forget_timeout(ev)
+        if ev[1] in SENDER_EVENTS:
+            self.__sender_event_done()
+        return {"type": ev[1], "time": ev[0], "seq_number": ev[3]}
+
+    def __forget_timeout(self, ev):
+        pending = self.timeouts[ev[3]]
+        pending.remove(ev)
+        if not pending:
+            del self.timeouts[ev[3]]
 
     def remove_timeout(self, seq_number=-1):
-        for i, ev in enumerate(self.queue):
-            if ev["type"] == Event.TIMEOUT and (seq_number == -1 or ev["seq_number"] == seq_number):
-                del self.queue[i]
+        if seq_number == -1:
+            keys = list(self.timeouts)
+        else:
+            keys = [seq_number] if seq_number in self.timeouts else []
+        for k in keys:
+            for ev in self.timeouts.pop(k):
+                ev[4] = False
+                self.__sender_event_done()
+
+    def __retime_send(self, t):
+        for ev in self.send_new:
+            heapq.heappush(self.send_bulk, (ev[2], ev))
+        self.send_new = []
+        self.send_time = t
+
+    def __prune_transmissions(self):
+        pending = self.trans_frame_end
+        while pending and not pending[0][4]:
+            pending.popleft()
+        while pending and not pending[-1][4]:
+            pending.pop()
+
+    def __transmission_end(self):
+        self.__prune_transmissions()
+        return self.trans_frame_end[-1][0] if self.trans_frame_end else None
 
     def move_send_next_event(self):
-        next_time = -1
-        for ev in self.queue:
-            if ev["type"] == Event.TRANS_FRAME_END:
-                next_time = ev["time"]
-        if next_time == -1:
-            possible_states = [Event.TIMEOUT, Event.RECEIVE_ACK, Event.RECEIVE_NACK]
-            for ev in self.queue:
-                if ev["type"] in possible_states and (next_time == -1 or next_time < ev["time"]):
-                    next_time = ev["time"]
-
-        for ev in self.queue:
-            if ev["type"] == Event.SEND_FRAME:
-                ev["time"] = next_time
+        next_time = self.__transmission_end()
+        if next_time is None:
+            pending = self.sender_events
+            while pending and not pending[0][1][4]:
+                heapq.heappop(pending)
+            # Without sender events nothing can open the window but an ACK, which retimes them again
+            next_time = -pending[0][0] if pending else float("inf")
+        self.__retime_send(next_time)
 
     def set_send_current_time(self, t):
-        for ev in self.queue:
-            if ev["type"] == Event.SEND_FRAME:
-                ev["time"] = t
+        self.__retime_send(t)
+
+    def only_send_events(self):
+        while self.heap and not self.heap[0][4]:
+            heapq.heappop(self.heap)
+        return not self.heap
 
 
 class ProtocolError(Exception):
     pass
 
 
-class Protocol:
-    def __init__(self, filename):
+class ProtocolConfig:
+    """A validated protocol configuration that can be shared by many Protocol instances."""
+
+    valid_protocols = ["Stop & Wait", "Go-Back-N", "Selective Repeat"]
+
+    def __init__(self, info):
+        if type(info) is not dict:
+            raise ProtocolError("The configuration should be a dictionary.")
         self.configuration = dict()
         self.configuration["frame transmission time"] = 1
         self.configuration["frame propagation time"] = 1
@@ -81,267 +208,426 @@ class Protocol:
         self.configuration["ack transmission time"] = 0.5
         self.configuration["ack propagation time"] = 1
         self.configuration["timeout"] = 12
-        self.frames_sent = 0
-        self.acks_sent = 0
-        self.queue = EventQueue()
-        self.sender_window_start = 0
-        self.log = None
-        valid_protocols = ["Stop & Wait", "Go-Back-N", "Selective Repeat"]
+        self.configuration["frames lost"] = []
+        self.configuration["acks lost"] = []
+
+        if info.get("protocol", "") not in self.valid_protocols:
+            raise ProtocolError(f"The selected protocol ({info.get('protocol')}) is no valid.")
+        if info.get("bit for numbering", 0) < 1:
+            raise ProtocolError(f"The number of bits for numbering the frames should be greater than 1.")
+        if info.get("number of frames", 0) < 1:
+            raise ProtocolError(f"The number of frames to be sent should be greater than 1.")
+        self.check_losses(info.get("frames lost", []), info.get("acks lost", []))
+        for k in ["frames loss model", "acks loss model"]:
+            if k in info:
+                try:
+                    losslib.check_model(info[k])
+                except losslib.LossModelException as e:
+                    raise ProtocolError(f"{k}: {e}")
+
+        for k, v in info.items():
+            if "time" in k and type(v) is not list and v < 0:
+                raise ProtocolError(f"{k} should be >= 0")
+
+        for k, v in info.items():
+            self.configuration[k] = v
+
+        self.max_number = 2 ** self.configuration["bit for numbering"]
+        if self.configuration["protocol"] == "Stop & Wait":
+            self.configuration["bit for numbering"] = 1
+            self.sender_window_size = 1
+            self.receiver_window_size = 1
+            self.max_number = 2
+        elif self.configuration["protocol"] == "Go-Back-N":
+            if self.configuration.get("sender window", self.max_number) >= self.max_number:
+                raise ProtocolError("Sender window size invalid")
+            self.sender_window_size = self.configuration["sender window"]
+            self.receiver_window_size = 1
+        else:
+            if self.configuration.get("sender window", self.max_number) > self.max_number / 2:
+                raise ProtocolError("Sender window size invalid")
+            self.sender_window_size = self.configuration["sender window"]
+            self.receiver_window_size = self.configuration["sender window"]
+
+    @staticmethod
+    def check_losses(frames_lost, acks_lost):
+        if type(frames_lost) is not list:
+            raise ProtocolError("The list of frames lost should be a list, even if only one frame is lost.")
+        for v in frames_lost:
+            if v < 1:
+                raise ProtocolError("The lost frames should be numbered as 1, 2...")
+        if type(acks_lost) is not list:
+            raise ProtocolError("The list of acks lost should be a list, even if only one is lost.")
+        for v in acks_lost:
+            if v < 1:
+                raise ProtocolError("The lost acks should be numbered as 1, 2...")
+
+    @classmethod
+    def from_file(cls, filename):
         try:
             with open(filename) as f:
                 info = json.load(f)
-
-            if info.get("protocol", "") not in valid_protocols:
-                raise ProtocolError(f"The selected protocol ({info.get('protocol')}) is no valid.")
-            if info.get("bit for numbering", 0) < 1:
-                raise ProtocolError(f"The number of bits for numbering the frames should be greater than 1.")
-            if info.get("number of frames", 0) < 1:
-                raise ProtocolError(f"The number of frames to be sent should be greater than 1.")
-            if type(info.get("frames lost", [])) is not list:
-                raise ProtocolError("The list of frames lost should be a list, even if only one frame is lost.")
-            else:
-                for v in info.get("frames lost", []):
-                    if v < 1:
-                        raise ProtocolError("The lost frames should be numbered as 1, 2...")
-            if type(info.get("acks lost", [])) is not list:
-                raise ProtocolError("The list of acks lost should be a list, even if only one is lost.")
-            else:
-                for v in info.get("ack lost", []):
-                    if v < 1:
-                        raise ProtocolError("The lost acks should be numbered as 1, 2...")
-
-            for k, v in info.items():
-                if "time" in k and type(v) is not list and v < 0:
-                    raise ProtocolError(f"{k} should be >= 0")
-
-            for k, v in info.items():
-                self.configuration[k] = v
-
-            self.max_number = 2 ** self.configuration["bit for numbering"]
-            if self.configuration["protocol"] == "Stop & Wait":
-                self.configuration["bit for numbering"] = 1
-                self.sender_window_size = 1
-                self.receiver_window_size = 1
-                self.max_number = 2
-            elif self.configuration["protocol"] == "Go-Back-N":
-                if self.configuration.get("sender window", self.max_number) >= self.max_number:
-                    raise ProtocolError("Sender window size invalid")
-                self.sender_window_size = self.configuration["sender window"]
-                self.receiver_window_size = 1
-            else:
-                if self.configuration.get("sender window", self.max_number) > self.max_number / 2:
-                    raise ProtocolError("Sender window size invalid")
-                self.sender_window_size = self.configuration["sender window"]
-                self.receiver_window_size = self.configuration["sender window"]
-
-            self.numbering = []
-            self.sender_window = []
-            self.receiver_window = []
-            for i in range(self.configuration["number of frames"]):
-                self.numbering.append(i % self.max_number)
-                self.sender_window.append(False)
-                self.receiver_window.append(False)
-
         except FileNotFoundError:
             raise ProtocolError(f"The file {filename} was not found")
         except ValueError:
             raise ProtocolError(f"Error reading json file {filename}")
+        return cls(info)
 
-    def __update_sender_window(self, n, v):
-        for i in range(self.sender_window_size):
-            if self.numbering[i + self.sender_window_start] == n:
-                self.sender_window[i + self.sender_window_start] = v
-                return
 
-    def __is_in_receiver_window(self, n):
-        first = None
-        is_first = None
-        for i, v in enumerate(self.numbering):
-            if not self.receiver_window[i] and first is None:
-                first = i
-            if first is not None and (i - first) < self.receiver_window_size and v == n:
-                is_first = i == first
-        if is_first is None:
-            return False, False, self.numbering[first-1] if first is not None else self.numbering[-1], 0
+class Protocol:
+    def __init__(self, filename):
+        self.__setup(ProtocolConfig.from_file(filename))
+
+    @classmethod
+    def from_dict(cls, info):
+        return cls.from_config(ProtocolConfig(info))
+
+    @classmethod
+    def from_config(cls, config):
+        prot = cls.__new__(cls)
+        prot.__setup(config)
+        return prot
+
+    def __setup(self, config):
+        self.config = config
+        self.configuration = config.configuration
+        self.max_number = config.max_number
+        self.sender_window_size = config.sender_window_size
+        self.receiver_window_size = config.receiver_window_size
+        self.number_of_frames = self.configuration["number of frames"]
+        self.frames_lost = self.configuration["frames lost"]
+        self.acks_lost = self.configuration["acks lost"]
+        self.frames_loss_model = self.configuration.get("frames loss model")
+        self.acks_loss_model = self.configuration.get("acks loss model")
+        self.seed = self.configuration.get("seed")
+        self.reset()
+
+    def reset(self, frames_lost=None, acks_lost=None, seed=None):
+        """Clears the state of a previous run. The loss lists can be replaced for the next run (a list
+        replaces the loss model too) and the random loss models can be reseeded."""
+        if frames_lost is not None or acks_lost is not None:
+            ProtocolConfig.check_losses(frames_lost if frames_lost is not None else [],
+                                        acks_lost if acks_lost is not None else [])
+        if frames_lost is not None:
+            self.frames_lost = frames_lost
+            self.frames_loss_model = None
+        if acks_lost is not None:
+            self.acks_lost = acks_lost
+            self.acks_loss_model = None
+        if seed is not None:
+            self.seed = seed
+
+        rng = None
+        if self.frames_loss_model or self.acks_loss_model:
+            rng = losslib.make_rng(self.seed)
+        if self.frames_loss_model:
+            self.frames_loss = losslib.build_model(self.frames_loss_model, rng)
+        else:
+            self.frames_loss = losslib.FixedLoss(self.frames_lost)
+        if self.acks_loss_model:
+            self.acks_loss = losslib.build_model(self.acks_loss_model, rng)
         else:
-            last = 0
-            for i, v in enumerate(self.numbering):
-                if self.receiver_window[i]:
-                    last = i
-            if last < first:
-                last = first
-            return True, is_first, self.numbering[first], self.numbering[last]
+            self.acks_loss = losslib.FixedLoss(self.acks_lost)
+
+        self.frames_sent = 0
+        self.acks_sent = 0
+        self.end_time = 0
+        self.total_delay = 0
+        self.queue = EventQueue()
+        self.log = None
+        # Only the frames inside each window carry state, so both windows are ring buffers
+        # indexed by frame position modulo the window size.
+        self.sender_window_start = 0
+        self.sender_window = [False] * self.sender_window_size
+        self.first_sent = [None] * self.sender_window_size
+        self.receiver_window_start = 0
+        self.receiver_window = [False] * self.receiver_window_size
+
+    def __number(self, i):
+        return i % self.max_number
+
+    def __position_in_window(self, n, start, size):
+        offset = (n - start) % self.max_number
+        if offset < size and start + offset < self.number_of_frames:
+            return start + offset
+        return None
+
+    def __in_sender_window(self, pos):
+        return self.sender_window_start <= pos < min(self.sender_window_start + self.sender_window_size,
+                                                     self.number_of_frames)
+
+    def __update_sender_window(self, pos, v):
+        if self.__in_sender_window(pos):
+            self.sender_window[pos % self.sender_window_size] = v
+
+    def __advance_sender_window(self, start, time):
+        for i in range(self.sender_window_start, start):
+            self.sender_window[i % self.sender_window_size] = False
+            sent = self.first_sent[i % self.sender_window_size]
+            if sent is not None:
+                self.total_delay += time - sent
+                self.first_sent[i % self.sender_window_size] = None
+        self.sender_window_start = start
+
+    def __is_in_receiver_window(self, n):
+        first = self.receiver_window_start
+        if first >= self.number_of_frames:
+            return False, False, self.__number(self.number_of_frames - 1)
+        pos = self.__position_in_window(n, first, self.receiver_window_size)
+        if pos is None:
+            return False, False, self.__number(first - 1)
+        return True, pos == first, self.__number(first)
 
     def __update_receiver_window(self, n):
-        for i, v in enumerate(self.numbering):
-            if v == n and not self.receiver_window[i]:
-                self.receiver_window[i] = True
-                return
+        pos = self.__position_in_window(n, self.receiver_window_start, self.receiver_window_size)
+        if pos is None:
+            return
+        self.receiver_window[pos % self.receiver_window_size] = True
+        while self.receiver_window_start < self.number_of_frames and \
+                self.receiver_window[self.receiver_window_start % self.receiver_window_size]:
+            self.receiver_window[self.receiver_window_start % self.receiver_window_size] = False
+            self.receiver_window_start += 1
 
     def __get_position(self, n):
-        for i in range(self.sender_window_start, self.sender_window_start+self.sender_window_size):
-            if self.numbering[i] == n:
-                return i
-        return None
+        return self.__position_in_window(n, self.sender_window_start, self.sender_window_size)
 
     def __sender_window_to_str(self):
         res = "["
-        for i in range(self.sender_window_start, self.sender_window_start+self.sender_window_size):
-            if i < len(self.sender_window):
-                if self.sender_window[i]:
-                    res += f" ({self.numbering[i]})"
-                else:
-                    res += f" {self.numbering[i]}"
+        end = min(self.sender_window_start + self.sender_window_size, self.number_of_frames)
+        for i in range(self.sender_window_start, end):
+            if self.sender_window[i % self.sender_window_size]:
+                res += f" ({self.__number(i)})"
+            else:
+                res += f" {self.__number(i)}"
         res += " ]"
         return res
 
     def __receiver_window_to_str(self):
         res = "["
-        first = None
-        for i, v in enumerate(self.numbering):
-            if not self.receiver_window[i] and first is None:
-                first = i
-            if first is not None and (i - first) < self.receiver_window_size:
-                if self.receiver_window[i]:
-                    res += f" ({self.numbering[i]})"
-                else:
-                    res += f" {self.numbering[i]}"
+        end = min(self.receiver_window_start + self.receiver_window_size, self.number_of_frames)
+        for i in range(self.receiver_window_start, end):
+            if self.receiver_window[i % self.receiver_window_size]:
+                res += f" ({self.__number(i)})"
+            else:
+                res += f" {self.__number(i)}"
         res += " ]"
         return res
 
     def __next(self, i):
         return (i+1) % self.max_number
 
-    def run(self):
-        log = []
-        for i in range(len(self.numbering)):
-            self.queue.add_event(Event.SEND_FRAME, 0, self.numbering[i])
+    def events(self):
+        """Runs the simulation yielding a LogEntry per action. The protocol state is the one of the entry
+        being yielded, so window_to_str() can format its window when needed."""
+        # Sender events carry the position of the frame and receiver events its sequence number, so an old
+        # retransmission cannot be mistaken for a newer frame with the same number.
+        self.queue.add_frames(self.number_of_frames)
 
-        log.append({"time": 0, "entity": 'sender', "type": "Initial State", "number": -1,
-                    "window": self.__sender_window_to_str()})
-        log.append({"time": 0, "entity": 'receiver', "type": "Initial State", "number": -1,
-                    "window": self.__receiver_window_to_str()})
+        yield LogEntry(0, 'sender', "Initial State", -1)
+        yield LogEntry(0, 'receiver', "Initial State", -1)
 
         while True:
             ev = self.queue.next_event()
             if ev is not None:
+                self.end_time = ev["time"]
                 if ev["type"] == Event.SEND_FRAME:
-                    if ev["seq_number"] in self.numbering[
-                                       self.sender_window_start:self.sender_window_size + self.sender_window_start]:
+                    pos = ev["seq_number"]
+                    if self.__in_sender_window(pos):
+                        if self.first_sent[pos % self.sender_window_size] is None:
+                            self.first_sent[pos % self.sender_window_size] = ev["time"]
                         next_time = ev["time"] + self.configuration["frame transmission time"]
-                        self.queue.add_event(Event.TRANS_FRAME_END, next_time, ev["seq_number"])
-                        log.append({"time": ev["time"], "entity": 'sender', "type": "Start to send Frame",
-                                    "number": ev["seq_number"], "window": self.__sender_window_to_str()})
+                        self.queue.add_event(Event.TRANS_FRAME_END, next_time, pos)
+                        yield LogEntry(ev["time"], 'sender', "Start to send Frame", self.__number(pos))
+                    elif pos < self.sender_window_start:
+                        # A retransmission of a frame acknowledged meanwhile, it must not delay the others
+                        continue
+                    elif self.queue.only_send_events():
+                        raise ProtocolError(f"The simulation got stuck waiting to send frame {self.__number(pos)}")
                     else:
                         self.queue.add_event_front(ev["type"], ev["time"], ev["seq_number"])
                     self.queue.move_send_next_event()
                 elif ev["type"] == Event.TRANS_FRAME_END:
-                    self.queue.add_event(Event.TIMEOUT, ev["time"] + self.configuration["timeout"], ev["seq_number"])
+                    pos = ev["seq_number"]
+                    if self.__in_sender_window(pos):
+                        self.queue.add_event(Event.TIMEOUT, ev["time"] + self.configuration["timeout"], pos)
                     self.frames_sent += 1
-                    self.__update_sender_window(ev["seq_number"], True)
-                    log.append({"time": ev["time"], "entity": 'sender', "type": "Frame completely sent",
-                                "number": ev["seq_number"], "window": self.__sender_window_to_str()})
-                    if self.frames_sent in self.configuration["frames lost"]:
-                        log.append({"time": ev["time"], "entity": 'sender', "type": "Frame lost",
-                                    "number": ev["seq_number"], "window": self.__sender_window_to_str()})
+                    self.__update_sender_window(pos, True)
+                    yield LogEntry(ev["time"], 'sender', "Frame completely sent", self.__number(pos))
+                    if self.frames_loss.is_lost(self.frames_sent):
+                        yield LogEntry(ev["time"], 'sender', "Frame lost", self.__number(pos))
                     else:
                         self.queue.add_event(Event.RECEIVE_FRAME,
                                              ev["time"] + self.configuration["frame propagation time"],
-                                             ev["seq_number"])
+                                             self.__number(pos))
                 elif ev["type"] == Event.TIMEOUT:
                     if self.configuration["protocol"] == "Go-Back-N":
-                        for i in range(self.sender_window_start + self.sender_window_size-1,
-                                       self.sender_window_start-1, -1):
-                            if self.sender_window[i]:
-                                self.queue.add_event_front(Event.SEND_FRAME, ev["time"], self.numbering[i])
-                                self.queue.remove_timeout(self.numbering[i])
-                                self.__update_sender_window(self.numbering[i], False)
+                        end = min(self.sender_window_start + self.sender_window_size, self.number_of_frames)
+                        for i in range(end-1, self.sender_window_start-1, -1):
+                            if self.sender_window[i % self.sender_window_size]:
+                                self.queue.add_event_front(Event.SEND_FRAME, ev["time"], i)
+                                self.queue.remove_timeout(i)
+                                self.__update_sender_window(i, False)
                     else:
                         self.queue.add_event_front(Event.SEND_FRAME, ev["time"], ev["seq_number"])
                         self.__update_sender_window(ev["seq_number"], False)
-                    log.append({"time": ev["time"], "entity": 'sender', "type": "Timeout", "number": ev["seq_number"],
-                                "window": self.__sender_window_to_str()})
+                    yield LogEntry(ev["time"], 'sender', "Timeout", self.__number(ev["seq_number"]))
                 elif ev["type"] == Event.RECEIVE_FRAME:
                     next_time = ev["time"] + self.configuration["processing time"]
                     self.queue.add_event(Event.PROC_ACK_TIME, next_time, ev["seq_number"])
-                    log.append({"time": ev["time"], "entity": 'receiver', "type": "Frame received",
-                                "number": ev["seq_number"], "window": self.__receiver_window_to_str()})
+                    yield LogEntry(ev["time"], 'receiver', "Frame received", ev["seq_number"])
                 elif ev["type"] == Event.PROC_ACK_TIME:
-                    is_in, first, val_ini, val_end = self.__is_in_receiver_window(ev["seq_number"])
+                    is_in, first, val_ini = self.__is_in_receiver_window(ev["seq_number"])
                     if is_in:
                         next_time = ev["time"] + self.configuration["ack transmission time"]
                         self.__update_receiver_window(ev["seq_number"])
                         if first:
+                            # The ACK covers every frame received in order, not the frames after a gap
+                            val_end = self.__number(self.receiver_window_start - 1)
                             self.queue.add_event(Event.TRANS_ACK_END, next_time, val_end)
-                            log.append({"time": ev["time"], "entity": 'receiver', "type": "Start to send ACK",
-                                        "number": self.__next(val_end), "window": self.__receiver_window_to_str()})
+                            yield LogEntry(ev["time"], 'receiver', "Start to send ACK", self.__next(val_end))
                         else:
                             self.queue.add_event(Event.TRANS_NACK_END, next_time, val_ini)
-                            log.append({"time": ev["time"], "entity": 'receiver', "type": "Start to send NACK",
-                                        "number": val_ini, "window": self.__receiver_window_to_str()})
+                            yield LogEntry(ev["time"], 'receiver', "Start to send NACK", val_ini)
                     else:
                         next_time = ev["time"] + self.configuration["ack transmission time"]
                         self.queue.add_event(Event.TRANS_ACK_END, next_time, val_ini)
-                        log.append({"time": ev["time"], "entity": 'receiver', "type": "Start to resend ACK",
-                                    "number": self.__next(val_ini), "window": self.__receiver_window_to_str()})
+                        yield LogEntry(ev["time"], 'receiver', "Start to resend ACK", self.__next(val_ini))
 
                 elif ev["type"] == Event.TRANS_ACK_END:
                     next_time = ev["time"] + self.configuration["ack propagation time"]
                     self.acks_sent += 1
-                    if self.acks_sent in self.configuration["acks lost"]:
-                        log.append({"time": ev["time"], "entity": 'receiver', "type": "ACK lost",
-                                    "number": self.__next(ev["seq_number"]), "window": self.__receiver_window_to_str()})
+                    if self.acks_loss.is_lost(self.acks_sent):
+                        yield LogEntry(ev["time"], 'receiver', "ACK lost", self.__next(ev["seq_number"]))
                     else:
                         self.queue.add_event(Event.RECEIVE_ACK, next_time, ev["seq_number"])
-                        log.append({"time": ev["time"], "entity": 'receiver', "type": "ACK sent",
-                                    "number": self.__next(ev["seq_number"]), "window": self.__receiver_window_to_str()})
+                        yield LogEntry(ev["time"], 'receiver', "ACK sent", self.__next(ev["seq_number"]))
                 elif ev["type"] == Event.TRANS_NACK_END:
                     next_time = ev["time"] + self.configuration["ack propagation time"]
                     self.acks_sent += 1
-                    if self.acks_sent in self.configuration["acks lost"]:
-                        log.append({"time": ev["time"], "entity": 'receiver', "type": "NACK lost",
-                                    "number": ev["seq_number"], "window": self.__receiver_window_to_str()})
+                    if self.acks_loss.is_lost(self.acks_sent):
+                        yield LogEntry(ev["time"], 'receiver', "NACK lost", ev["seq_number"])
                     else:
                         self.queue.add_event(Event.RECEIVE_NACK, next_time, ev["seq_number"])
-                        log.append({"time": ev["time"], "entity": 'receiver', "type": "NACK sent",
-                                    "number": ev["seq_number"], "window": self.__receiver_window_to_str()})
+                        yield LogEntry(ev["time"], 'receiver', "NACK sent", ev["seq_number"])
                 elif ev["type"] == Event.RECEIVE_ACK:
                     pos = self.__get_position(ev["seq_number"])
                     if pos is not None:
                         for i in range(self.sender_window_start, pos+1):
-                            self.queue.remove_timeout(self.numbering[i])
-                        self.sender_window_start = pos+1
+                            self.queue.remove_timeout(i)
+                        self.__advance_sender_window(pos+1, ev["time"])
                         self.queue.set_send_current_time(ev["time"])
-                    log.append({"time": ev["time"], "entity": 'sender', "type": "ACK received",
-                                "number": self.__next(ev["seq_number"]), "window": self.__sender_window_to_str()})
+                    yield LogEntry(ev["time"], 'sender', "ACK received", self.__next(ev["seq_number"]))
 
                 elif ev["type"] == Event.RECEIVE_NACK:
-                    self.queue.remove_timeout(ev["seq_number"])
-                    self.queue.add_event_front(Event.SEND_FRAME, ev["time"], ev["seq_number"])
-                    log.append({"time": ev["time"], "entity": 'sender', "type": "NACK received - retransmit",
-                                "number": ev["seq_number"], "window": self.__sender_window_to_str()})
+                    pos = self.__get_position(ev["seq_number"])
+                    if pos is not None:
+                        self.queue.remove_timeout(pos)
+                        self.queue.add_event_front(Event.SEND_FRAME, ev["time"], pos)
+                    yield LogEntry(ev["time"], 'sender', "NACK received - retransmit", ev["seq_number"])
             else:
                 break
-        self.log = log
+
+    def window_to_str(self, entity):
+        if entity == 'sender':
+            return self.__sender_window_to_str()
+        return self.__receiver_window_to_str()
+
+    def run(self, sink=None):
+        """Without a sink the whole log is kept for write(), with a sink it is streamed."""
+        if sink is None:
+            self.log = [{"time": e.time, "entity": e.entity, "type": e.type, "number": e.number,
+                         "window": self.window_to_str(e.entity)} for e in self.events()]
+            return
+        sink.start()
+        for e in self.events():
+            sink.write(e, self)
+        sink.end()
+
+    def summary(self):
+        frames = self.number_of_frames
+        useful_time = frames * self.configuration["frame transmission time"]
+        return {"completion time": self.end_time,
+                "frames_sent": self.frames_sent,
+                "acks_sent": self.acks_sent,
+                "retransmissions": self.frames_sent - frames,
+                "efficiency": useful_time / self.end_time if self.end_time > 0 else 1.0,
+                "throughput": frames / self.end_time if self.end_time > 0 else None,
+                "mean delay": self.total_delay / frames}
 
     def write(self):
         if not self.log:
             return
 
-        print('{0:<6} {1:<20} {2:<30} {3:>30} {4:<20}'.format("time", "Sender Window", "Sender Action",
-                                                              "Receiver Action", "Receiver Window"))
+        print(TableSink.header())
         for e in self.log:
-            if 'NACK' in e['type']:
-                seq = f" (NACK{str(e['number'])})"
-            elif 'ACK' in e['type']:
-                seq = f" (ACK{str(e['number'])})"
-            else:
-                if e['number'] == -1:
-                    seq = ''
-                else:
-                    seq = f" (T{str(e['number'])})"
+            print(TableSink.row(LogEntry(e["time"], e["entity"], e["type"], e["number"]), e["window"]))
+
+
+LogEntry = namedtuple("LogEntry", ["time", "entity", "type", "number"])
+
+
+class NullSink:
+    """Discards the log, for runs where only summary() matters."""
 
-            if e['entity'] == 'sender':
-                print(f"{e['time']:<6} {e['window']:<20} {e['type'] + seq:<30}")
+    def start(self):
+        pass
+
+    def write(self, entry, prot):
+        pass
+
+    def end(self):
+        pass
+
+
+class TableSink(NullSink):
+    def __init__(self, f=None):
+        self.f = f or sys.stdout
+
+    @staticmethod
+    def header():
+        return '{0:<6} {1:<20} {2:<30} {3:>30} {4:<20}'.format("time", "Sender Window", "Sender Action",
+                                                               "Receiver Action", "Receiver Window")
+
+    @staticmethod
+    def row(e, window):
+        if 'NACK' in e.type:
+            seq = f" (NACK{str(e.number)})"
+        elif 'ACK' in e.type:
+            seq = f" (ACK{str(e.number)})"
+        else:
+            if e.number == -1:
+                seq = ''
             else:
-                print(f"{e['time']:<6} {'':<20} {'':<30} {e['type'] + seq:>30} {e['window']:<20} ")
+                seq = f" (T{str(e.number)})"
+
+        if e.entity == 'sender':
+            return f"{e.time:<6} {window:<20} {e.type + seq:<30}"
+        else:
+            return f"{e.time:<6} {'':<20} {'':<30} {e.type + seq:>30} {window:<20} "
+
+    def start(self):
+        print(self.header(), file=self.f)
+
+    def write(self, entry, prot):
+        print(self.row(entry, prot.window_to_str(entry.entity)), file=self.f)
+
+
+class CSVSink(NullSink):
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+
+    def start(self):
+        self.writer.writerow(["time", "entity", "type", "number", "window"])
+
+    def write(self, entry, prot):
+        self.writer.writerow([entry.time, entry.entity, entry.type, entry.number, prot.window_to_str(entry.entity)])
+
+
+class JSONLinesSink(NullSink):
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, entry, prot):
+        record = entry._asdict()
+        record["window"] = prot.window_to_str(entry.entity)
+        self.f.write(json.dumps(record) + "\n")
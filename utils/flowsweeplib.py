@@ -0,0 +1,160 @@
+import sys
+import os
+import csv
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import numpy as np
+except ImportError:
+    np = None
+sys.path.append('..')
+from utils import flowcontrollib
+
+
+SUMMARY_FIELDS = ["completion time", "frames_sent", "acks_sent", "retransmissions", "efficiency", "throughput",
+                  "mean delay", "error"]
+MONTECARLO_FIELDS = ["completion time", "throughput", "efficiency", "mean delay", "retransmissions"]
+PERCENTILES = [5, 50, 95, 99]
+
+
+class SweepError(Exception):
+    pass
+
+
+def expand_values(values):
+    """A parameter range is either a list of values or {"start", "stop", "step"} (stop included)."""
+    if type(values) is list:
+        return values
+    if type(values) is dict:
+        try:
+            start, stop, step = values["start"], values["stop"], values.get("step", 1)
+        except KeyError:
+            raise SweepError("A range should define at least start and stop")
+        if step <= 0:
+            raise SweepError("The step of a range should be greater than 0")
+        res = []
+        v = start
+        while v <= stop:
+            res.append(v)
+            v = start + len(res) * step
+        return res
+    raise SweepError("Each parameter should be a list of values or a range")
+
+
+def generate_configs(base, ranges):
+    """Yields (parameters, configuration) for every combination of the ranges."""
+    names = list(ranges.keys())
+    values = [expand_values(ranges[k]) for k in names]
+    for combination in itertools.product(*values):
+        params = dict(zip(names, combination))
+        config = dict(base)
+        config.update(params)
+        yield params, config
+
+
+def run_config(config):
+    try:
+        prot = flowcontrollib.Protocol.from_dict(config)
+        prot.run(flowcontrollib.NullSink())
+        res = prot.summary()
+        res["error"] = ""
+    except (flowcontrollib.ProtocolError, TypeError, ValueError) as e:
+        # Values of the wrong type (for instance numbers given as strings) fail in the comparisons
+        res = {k: None for k in SUMMARY_FIELDS}
+        res["error"] = str(e)
+    return res
+
+
+class CSVWriter:
+    def __init__(self, f, params):
+        self.writer = csv.writer(f)
+        self.writer.writerow(params + SUMMARY_FIELDS)
+        self.params = params
+
+    def write(self, params, summary):
+        self.writer.writerow([json.dumps(params[k]) if type(params[k]) is list else params[k] for k in self.params] +
+                             [summary[k] for k in SUMMARY_FIELDS])
+
+
+class JSONLinesWriter:
+    def __init__(self, f, params):
+        self.f = f
+
+    def write(self, params, summary):
+        record = dict(params)
+        record.update(summary)
+        self.f.write(json.dumps(record) + "\n")
+
+
+def sweep(base, ranges, output, workers=None):
+    """Runs every combination of ranges over base using all cores and writes one summary per run
+    to output (CSV or JSON lines depending on the extension). Returns the number of runs."""
+    if output.endswith(".csv"):
+        writer_class = CSVWriter
+    elif output.endswith(".jsonl") or output.endswith(".json"):
+        writer_class = JSONLinesWriter
+    else:
+        raise SweepError("The output file should be .csv or .jsonl")
+
+    runs = list(generate_configs(base, ranges))
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(runs) // (workers * 4))
+    with open(output, "w", newline="") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = writer_class(f, list(ranges.keys()))
+        summaries = pool.map(run_config, [config for _, config in runs], chunksize=chunksize)
+        for (params, _), summary in zip(runs, summaries):
+            writer.write(params, summary)
+    return len(runs)
+
+
+def run_replications(config, seeds):
+    prot = flowcontrollib.Protocol.from_config(config)
+    res = {k: [] for k in MONTECARLO_FIELDS}
+    errors = 0
+    for seed in seeds:
+        prot.reset(seed=seed)
+        try:
+            prot.run(flowcontrollib.NullSink())
+        except flowcontrollib.ProtocolError:
+            errors += 1
+            continue
+        summary = prot.summary()
+        for k in MONTECARLO_FIELDS:
+            res[k].append(summary[k])
+    return res, errors
+
+
+def montecarlo(base, replications, seed=None, workers=None):
+    """Runs replications of base (usually with random loss models), each one with an independent seed,
+    and returns the mean and percentiles of every metric in MONTECARLO_FIELDS."""
+    if replications < 1:
+        raise SweepError("The number of replications should be greater than 0")
+    if np is None:
+        raise SweepError("numpy module is required for Monte-Carlo runs")
+    try:
+        config = flowcontrollib.ProtocolConfig(base)
+    except flowcontrollib.ProtocolError as e:
+        raise SweepError(str(e))
+
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    workers = min(workers or os.cpu_count() or 1, replications)
+    chunks = [seeds[i::workers] for i in range(workers)]
+    values = {k: [] for k in MONTECARLO_FIELDS}
+    errors = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for res, err in pool.map(run_replications, [config] * workers, chunks):
+            errors += err
+            for k in MONTECARLO_FIELDS:
+                values[k] += res[k]
+
+    stats = {"replications": replications, "errors": errors}
+    for k in MONTECARLO_FIELDS:
+        v = np.array([x for x in values[k] if x is not None], dtype=float)
+        if len(v) == 0:
+            stats[k] = None
+            continue
+        stats[k] = {"mean": float(v.mean())}
+        for p, value in zip(PERCENTILES, np.percentile(v, PERCENTILES)):
+            stats[k][f"p{p}"] = float(value)
+    return stats
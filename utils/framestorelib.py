@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import shutil
+sys.path.append('..')
+from utils import maclib, pcaplib, tsharklib
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VERSION = 1
+# Columns of the store and their types (little endian). src and dst are also kept as codes of the
+# dictionary of MACs (macs), which is sorted
+COLUMNS = {"timestamp": "<f8", "src": "<u8", "dst": "<u8", "length": "<u4", "ethertype": "<u2",
+           "src code": "<u4", "dst code": "<u4"}
+GROUPS = ("src", "dst", "ethertype")
+
+
+class FrameStoreException(Exception):
+    pass
+
+
+def _check_numpy():
+    if np is None:
+        raise FrameStoreException("numpy module is required for frame stores")
+
+
+def default_store(source):
+    """Directory of the store of a capture or a dump, next to it."""
+    return source + ".frames"
+
+
+def _column_file(store, column):
+    return os.path.join(store, column.replace(" ", "-") + ".bin")
+
+
+def _dump_batches(source):
+    """Batches (dictionaries of arrays like pcaplib batches) of a tshark field dump. Dumps have no
+    timestamps (NaN) nor ethertypes (0); lines with invalid MACs or lengths are skipped."""
+    with open(source, "rb") as f:
+        for lines in tsharklib.read_lines(f):
+            fields = [line.split() for line in lines]
+            fields = [v for v in fields if len(v) == 3 and v[2].isdigit()]
+            if not fields:
+                continue
+            dst, valid_dst = maclib.to_numbers([v[0] for v in fields])
+            src, valid_src = maclib.to_numbers([v[1] for v in fields])
+            valid = valid_dst & valid_src
+            lengths = np.array([int(v[2]) for v in fields], dtype=np.uint64)
+            valid &= lengths <= 0xffffffff
+            yield {"timestamp": np.full(int(valid.sum()), np.nan), "dst": dst[valid], "src": src[valid],
+                   "ethertype": np.zeros(int(valid.sum()), dtype=np.uint16),
+                   "length": lengths[valid].astype(np.uint32)}
+
+
+def ingest(source, store=None):
+    """Converts a capture (pcapng or pcap) or a tshark field dump into a columnar store: a directory with
+    one file of fixed width values per column and meta.json, which records the size and modification
+    time of the source. Returns the directory of the store."""
+    _check_numpy()
+    store = store or default_store(source)
+    try:
+        stat = os.stat(source)
+        if os.path.isdir(store):
+            shutil.rmtree(store)
+        os.makedirs(store)
+        files = {c: open(_column_file(store, c), "wb") for c in ("timestamp", "src", "dst", "length", "ethertype")}
+        count = 0
+        try:
+            if pcaplib.is_capture(source):
+                with pcaplib.PcapReader(source) as reader:
+                    for batch in reader.batches():
+                        for column, f in files.items():
+                            f.write(batch[column].astype(COLUMNS[column]).tobytes())
+                        count += len(batch["src"])
+            else:
+                for batch in _dump_batches(source):
+                    for column, f in files.items():
+                        f.write(batch[column].astype(COLUMNS[column]).tobytes())
+                    count += len(batch["src"])
+        finally:
+            for f in files.values():
+                f.close()
+
+        # Dictionary of the MACs seen as source or destination and the code of every frame
+        macs = np.zeros(0, dtype=np.uint64)
+        for column in ("src", "dst"):
+            macs = np.union1d(macs, np.unique(np.fromfile(_column_file(store, column), dtype=COLUMNS[column])))
+        macs.astype("<u8").tofile(os.path.join(store, "macs.bin"))
+        for column in ("src", "dst"):
+            values = np.fromfile(_column_file(store, column), dtype=COLUMNS[column])
+            np.searchsorted(macs, values).astype(COLUMNS[column + " code"]).tofile(_column_file(store, column + " code"))
+
+        with open(os.path.join(store, "meta.json"), "w") as f:
+            json.dump({"version": VERSION, "source": os.path.abspath(source), "size": stat.st_size,
+                       "mtime": stat.st_mtime, "frames": count, "macs": len(macs)}, f)
+    except OSError as e:
+        raise FrameStoreException(f"The store of {source} can not be created ({e})")
+    return store
+
+
+def is_fresh(source, store=None):
+    """Whether the store of a source exists and was built from its current version (same size and
+    modification time)."""
+    store = store or default_store(source)
+    try:
+        with open(os.path.join(store, "meta.json")) as f:
+            meta = json.load(f)
+        stat = os.stat(source)
+    except (OSError, ValueError):
+        return False
+    return meta.get("version") == VERSION and meta.get("size") == stat.st_size and meta.get("mtime") == stat.st_mtime
+
+
+def open_store(source, store=None):
+    """FrameStore of a source, ingesting it first if there is no store or the source has changed."""
+    store = store or default_store(source)
+    if not is_fresh(source, store):
+        ingest(source, store)
+    return FrameStore(store)
+
+
+class FrameStore:
+    """Store built by ingest(). Columns are memory mapped, so opening it reads nothing, and queries are
+    vectorized scans over them."""
+
+    def __init__(self, store):
+        _check_numpy()
+        try:
+            with open(os.path.join(store, "meta.json")) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError) as e:
+            raise FrameStoreException(f"{store} is not a frame store ({e})")
+        if self.meta.get("version") != VERSION:
+            raise FrameStoreException(f"{store} was built by another version")
+        self.store = store
+        self.columns = {}
+        self.macs = self.__map(os.path.join(store, "macs.bin"), "<u8", self.meta["macs"])
+
+    def __map(self, filename, dtype, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        try:
+            return np.memmap(filename, dtype=dtype, mode="r", shape=(count,))
+        except (OSError, ValueError) as e:
+            raise FrameStoreException(f"{self.store} is corrupted ({e})")
+
+    def __len__(self):
+        return self.meta["frames"]
+
+    def __getitem__(self, column):
+        """Column (one of COLUMNS) as a read only array."""
+        if column not in COLUMNS:
+            raise FrameStoreException(f"Unknown column {column}")
+        if column not in self.columns:
+            self.columns[column] = self.__map(_column_file(self.store, column), COLUMNS[column], len(self))
+        return self.columns[column]
+
+    def mac_code(self, mac):
+        """Code of a MAC (text or number) in the dictionary, None if it is not in the store."""
+        number = mac if type(mac) is int else maclib.parse_mac(mac)
+        i = int(np.searchsorted(self.macs, number))
+        return i if i < len(self.macs) and self.macs[i] == number else None
+
+    def select(self, src=None, dst=None, ethertype=None, start=None, end=None):
+        """Bool array of the frames sent by src, received by dst, with the given ethertype and whose
+        timestamp is in [start, end). Conditions that are None are not checked."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, mac in (("src code", src), ("dst code", dst)):
+            if mac is not None:
+                code = self.mac_code(mac)
+                if code is None:
+                    return np.zeros(len(self), dtype=bool)
+                mask &= self[column] == code
+        if ethertype is not None:
+            mask &= self["ethertype"] == ethertype
+        if start is not None:
+            mask &= self["timestamp"] >= start
+        if end is not None:
+            mask &= self["timestamp"] < end
+        return mask
+
+    def group_by(self, key="src", value="bytes", mask=None):
+        """Total bytes (or frames) of every source or destination MAC or ethertype, of the frames of
+        mask (all by default). Returns {MAC as text or ethertype: total}."""
+        if key not in GROUPS or value not in ("bytes", "frames"):
+            raise FrameStoreException(f"Frames can be grouped by {', '.join(GROUPS)} adding bytes or frames")
+        if key == "ethertype":
+            codes, labels = self["ethertype"], None
+            size = 1 << 16
+        else:
+            codes, labels = self[key + " code"], self.macs
+            size = len(self.macs)
+        weights = self["length"] if value == "bytes" else None
+        if mask is not None:
+            codes = codes[mask]
+            weights = weights[mask] if weights is not None else None
+        totals = np.bincount(codes, weights=weights, minlength=size).astype(np.int64)
+        present = np.flatnonzero(totals)
+        if labels is None:
+            return dict(zip(present.tolist(), totals[present].tolist()))
+        return dict(zip(maclib.from_numbers(labels[present]).tolist(), totals[present].tolist()))
@@ -0,0 +1,227 @@
+import os
+import sys
+import errno
+import time
+import socket
+import threading
+sys.path.append('..')
+from utils import maclib, netlib
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import netifaces
+except ImportError:
+    netifaces = None
+
+SYS_CLASS_NET = "/sys/class/net"
+# Netlink groups notified when links or addresses change (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+# Without netlink the snapshot is also rebuilt when it is older than this number of seconds
+TTL = 5
+
+
+class InterfaceException(Exception):
+    pass
+
+
+def _ipv6_prefix(netmask):
+    try:
+        return bin(int.from_bytes(socket.inet_pton(socket.AF_INET6, netmask), "big")).count("1")
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _ipv4(address, netmask, broadcast):
+    """Record of an IPv4 address, with its Network if the mask is valid."""
+    try:
+        network = netlib.Network(address, netmask) if netmask else None
+    except netlib.NetworkException:
+        network = None
+    return {"address": address, "netmask": netmask, "broadcast": broadcast, "network": network}
+
+
+def _record(name):
+    return {"name": name, "mac": None, "ipv4": [], "ipv6": [], "up": None, "flags": [], "mtu": None,
+            "speed": None, "duplex": None}
+
+
+def _mac(address):
+    try:
+        return maclib.MACAddress(address)
+    except maclib.MACAddressException:
+        return None
+
+
+def scan_psutil():
+    """Records of every interface built from psutil (one call for the addresses of all of them and one
+    for their state)."""
+    records = {}
+    for nic, addrs in psutil.net_if_addrs().items():
+        record = records[nic] = _record(nic)
+        for addr in addrs:
+            if addr.family == psutil.AF_LINK:
+                record["mac"] = record["mac"] or _mac(addr.address)
+            elif addr.family == socket.AF_INET:
+                record["ipv4"].append(_ipv4(addr.address, addr.netmask, addr.broadcast))
+            elif addr.family == socket.AF_INET6:
+                record["ipv6"].append({"address": addr.address, "netmask": addr.netmask,
+                                       "prefix": _ipv6_prefix(addr.netmask)})
+    for nic, st in psutil.net_if_stats().items():
+        record = records.setdefault(nic, _record(nic))
+        record["up"] = st.isup
+        record["flags"] = [f for f in getattr(st, "flags", "").split(",") if f]
+        record["mtu"] = st.mtu
+        record["speed"] = st.speed
+        record["duplex"] = {psutil.NIC_DUPLEX_FULL: "full", psutil.NIC_DUPLEX_HALF: "half"}.get(st.duplex)
+    return list(records.values())
+
+
+def scan_netifaces():
+    """Records of every interface built from netifaces, which only knows the addresses."""
+    records = []
+    for nic in netifaces.interfaces():
+        record = _record(nic)
+        addrs = netifaces.ifaddresses(nic)
+        for addr in addrs.get(netifaces.AF_LINK, []):
+            record["mac"] = record["mac"] or _mac(addr.get("addr"))
+        for addr in addrs.get(netifaces.AF_INET, []):
+            record["ipv4"].append(_ipv4(addr.get("addr"), addr.get("netmask"), addr.get("broadcast")))
+        for addr in addrs.get(netifaces.AF_INET6, []):
+            netmask = addr.get("netmask", "").split("/")[0]
+            record["ipv6"].append({"address": addr.get("addr"), "netmask": netmask, "prefix": _ipv6_prefix(netmask)})
+        records.append(record)
+    return records
+
+
+def scan():
+    if psutil is not None:
+        return scan_psutil()
+    if netifaces is not None:
+        return scan_netifaces()
+    raise InterfaceException("netifaces or psutil modules are required")
+
+
+class _NetlinkWatcher:
+    """Socket subscribed to the netlink notifications of links and addresses. Nothing is parsed: any
+    pending message means that something changed."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, 0)
+        try:
+            self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def changed(self):
+        """Whether something changed since the last call. Errors other than an overflow are raised."""
+        changed = False
+        while True:
+            try:
+                if not self.sock.recv(65536):
+                    return changed
+            except BlockingIOError:
+                return changed
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # The buffer overflowed: messages were lost, but it surely changed
+            changed = True
+
+    def close(self):
+        self.sock.close()
+
+
+class Inventory:
+    """Snapshot of the interfaces of the machine, rebuilt only when it may be stale. On Linux a netlink
+    socket tells when links or addresses change, so reading an unchanged inventory costs one system call;
+    elsewhere it is rebuilt when the list of /sys/class/net changes or after ttl seconds."""
+
+    def __init__(self, ttl=TTL, scanner=scan):
+        self.ttl = ttl
+        self.scanner = scanner
+        self.lock = threading.Lock()
+        self.records = None
+        self.by_name = {}
+        self.time = None
+        self.names = None
+        try:
+            self.watcher = _NetlinkWatcher()
+        except (AttributeError, OSError):
+            # No AF_NETLINK (not Linux) or not allowed
+            self.watcher = None
+
+    def __listing(self):
+        try:
+            return sorted(os.listdir(SYS_CLASS_NET))
+        except OSError:
+            return None
+
+    def __changed(self):
+        """Asks the watcher. If the socket fails it is dropped and the inventory goes back to the ttl and
+        the listing of /sys/class/net, so the current snapshot is taken as stale."""
+        try:
+            return self.watcher.changed()
+        except OSError:
+            self.watcher.close()
+            self.watcher = None
+            return True
+
+    def __stale(self):
+        if self.records is None:
+            return True
+        if self.watcher is not None:
+            return self.__changed()
+        return time.monotonic() - self.time >= self.ttl or self.__listing() != self.names
+
+    def refresh(self):
+        """Rebuilds the snapshot now."""
+        with self.lock:
+            self.__refresh()
+
+    def __refresh(self):
+        # Notifications received from now on belong to the next snapshot
+        if self.watcher is not None:
+            self.__changed()
+        if self.watcher is None:
+            self.names = self.__listing()
+        self.records = list(self.scanner())
+        self.by_name = {r["name"]: r for r in self.records}
+        self.time = time.monotonic()
+
+    def interfaces(self):
+        """Records of every interface, in the order of the system: name, mac (MACAddress or None), ipv4
+        (address, netmask, broadcast and network as a Network), ipv6 (address, netmask and prefix), up,
+        flags, mtu, speed (Mb/s) and duplex ("full", "half" or None). Values a backend can not get are
+        None."""
+        with self.lock:
+            if self.__stale():
+                self.__refresh()
+            return self.records
+
+    def get(self, name):
+        """Record of an interface, None if it does not exist."""
+        self.interfaces()
+        return self.by_name.get(name)
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_inventory():
+    """Inventory shared by the whole program, created once."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Inventory()
+    return _default
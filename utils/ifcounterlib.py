@@ -0,0 +1,152 @@
+import os
+import time
+from collections import deque
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROC_NET_DEV = "/proc/net/dev"
+SYS_CLASS_NET = "/sys/class/net"
+# Samples kept in the history by default
+HISTORY = 600
+# Link speeds change rarely, they are read again after this number of seconds
+SPEED_REFRESH = 10
+# Counters of 32 bit systems wrap around at this value
+WRAP = 1 << 32
+
+
+class CounterException(Exception):
+    pass
+
+
+def read_proc_net_dev(path=PROC_NET_DEV):
+    """{interface: (received bytes, received packets, sent bytes, sent packets)} read from /proc/net/dev,
+    which is much cheaper than asking psutil when there are hundreds of interfaces."""
+    with open(path, "rb") as f:
+        data = f.read()
+    res = {}
+    # The first two lines are the header
+    for line in data.split(b"\n")[2:]:
+        name, sep, values = line.partition(b":")
+        if not sep:
+            continue
+        values = values.split()
+        res[name.strip().decode()] = (int(values[0]), int(values[1]), int(values[8]), int(values[9]))
+    return res
+
+
+def read_psutil():
+    if psutil is None:
+        raise CounterException("psutil module or /proc/net/dev are required")
+    return {nic: (c.bytes_recv, c.packets_recv, c.bytes_sent, c.packets_sent)
+            for nic, c in psutil.net_io_counters(pernic=True).items()}
+
+
+def read_counters():
+    """Counters of every interface, from /proc/net/dev if it exists and from psutil otherwise."""
+    if os.path.exists(PROC_NET_DEV):
+        return read_proc_net_dev()
+    return read_psutil()
+
+
+def read_speeds():
+    """{interface: speed in Mb/s}, 0 if it is unknown."""
+    if psutil is not None:
+        return {nic: max(st.speed, 0) for nic, st in psutil.net_if_stats().items()}
+    res = {}
+    try:
+        names = os.listdir(SYS_CLASS_NET)
+    except OSError:
+        return res
+    for nic in names:
+        try:
+            with open(os.path.join(SYS_CLASS_NET, nic, "speed")) as f:
+                res[nic] = max(int(f.read()), 0)
+        except (OSError, ValueError):
+            # Virtual interfaces have no speed
+            res[nic] = 0
+    return res
+
+
+def _delta(new, old):
+    if new >= old:
+        return new - old
+    # 32 bit counters wrap around, bigger ones only go back when the interface is reset
+    return new + WRAP - old if old < WRAP else new
+
+
+class CounterSampler:
+    """Samples the counters of the interfaces (all or the given ones) and computes the bits and packets
+    per second since the previous sample and the utilization of the link (the biggest of both directions
+    against the speed, None if it is unknown). The last history samples are kept in a ring buffer."""
+
+    def __init__(self, interfaces=None, history=HISTORY, reader=read_counters, speeds=read_speeds):
+        self.interfaces = set(interfaces) if interfaces else None
+        self.history = deque(maxlen=history)
+        self.reader = reader
+        self.speeds = speeds
+        self.last = None
+        self.last_time = None
+        self.link_speeds = {}
+        self.speeds_time = None
+
+    def __read(self):
+        counters = self.reader()
+        if self.interfaces is not None:
+            counters = {nic: v for nic, v in counters.items() if nic in self.interfaces}
+        return counters
+
+    def sample(self, now=None):
+        """Reads the counters and returns the sample {"time": t, "interfaces": {name: rates}} (appended
+        to the history), None for the first call, which only sets the starting point."""
+        counters = self.__read()
+        now = time.monotonic() if now is None else now
+        if self.speeds_time is None or now - self.speeds_time >= SPEED_REFRESH:
+            self.link_speeds = self.speeds()
+            self.speeds_time = now
+        last, elapsed = self.last, now - self.last_time if self.last_time is not None else 0
+        self.last, self.last_time = counters, now
+        if last is None or elapsed <= 0:
+            return None
+
+        rates = {}
+        speeds = self.link_speeds
+        for nic, (rx_bytes, rx_packets, tx_bytes, tx_packets) in counters.items():
+            old = last.get(nic)
+            if old is None:
+                continue
+            rx_bps = 8 * _delta(rx_bytes, old[0]) / elapsed
+            tx_bps = 8 * _delta(tx_bytes, old[2]) / elapsed
+            speed = speeds.get(nic, 0)
+            rates[nic] = {"rx bps": rx_bps, "tx bps": tx_bps,
+                          "rx pps": _delta(rx_packets, old[1]) / elapsed,
+                          "tx pps": _delta(tx_packets, old[3]) / elapsed,
+                          "utilization": max(rx_bps, tx_bps) / (speed * 1e6) if speed else None}
+        res = {"time": time.time(), "interval": elapsed, "interfaces": rates}
+        self.history.append(res)
+        return res
+
+    def run(self, interval, samples=None, emit=None):
+        """Samples every interval seconds (samples times, forever if it is None) calling emit with every
+        sample. Sampling times are fixed, so the time spent sampling does not delay the next sample."""
+        self.sample()
+        next_time = time.monotonic()
+        done = 0
+        while samples is None or done < samples:
+            next_time += interval
+            wait = next_time - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                # Too slow for the interval, the missed samples are skipped
+                next_time = time.monotonic()
+            res = self.sample()
+            done += 1
+            if emit is not None and res is not None:
+                emit(res)
+
+
+def to_records(sample):
+    """One flat record per interface of a sample, to be written as JSON lines."""
+    return [{"time": sample["time"], "interface": nic, **rates} for nic, rates in sample["interfaces"].items()]
@@ -1,35 +1,110 @@
-import re
+import warnings
+from functools import lru_cache
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Parsed addresses kept by the parser cache (0 disables it)
+CACHE_SIZE = 4096
+
 
 class IPAddressException(Exception):
     pass
 
 
+def _parse_ip(ip):
+    if type(ip) is not str:
+        raise IPAddressException("Incorrect IP")
+    values = ip.split(".")
+    if len(values) != 4:
+        raise IPAddressException("Incorrect IP")
+    number = 0
+    for v in values:
+        if not 0 < len(v) <= 3 or not (v.isascii() and v.isdigit()):
+            raise IPAddressException("Incorrect IP")
+        v = int(v)
+        if v > 255:
+            raise IPAddressException("Incorrect IP")
+        number = (number << 8) | v
+    return number
+
+
+parse_ip = lru_cache(maxsize=CACHE_SIZE)(_parse_ip) if CACHE_SIZE else _parse_ip
+
+
+def set_cache_size(size):
+    """Changes the number of dotted strings whose value is remembered (0 disables the cache)."""
+    global parse_ip
+    parse_ip = lru_cache(maxsize=size)(_parse_ip) if size else _parse_ip
+
+
+def number_to_str(number):
+    number &= 0xffffffff
+    return f"{number >> 24}.{(number >> 16) & 0xff}.{(number >> 8) & 0xff}.{number & 0xff}"
+
+
 class IPAddress():
+    """IPv4 address stored as a 32 bit number. It can be built from its dotted string or its number and the
+    string is only formatted when it is needed."""
+
+    __slots__ = ("number", "_text")
+
     def __init__(self, ip):
-        if not self.__check_ip(ip):
-            raise IPAddressException("Incorrect IP")
-        self.ip = ip
-
-    def __check_ip(self, ip):
-        if not re.search(r"^([0-9]{1,3}.){3}[0-9]{1,3}$", ip):
-            return False
-        values = ip.split(".")
-        if len(values) != 4:
-            return False
-        try:
-            for v in values:
-                v = int(v)
-                if v < 0 or v > 255:
-                    return False
-        except:
-            return False
-        return True
+        if type(ip) is int:
+            if ip < 0 or ip > 0xffffffff:
+                raise IPAddressException("Incorrect IP")
+            self.number = ip
+            self._text = None
+        else:
+            self.number = parse_ip(ip)
+            self._text = ip
+
+    @property
+    def ip(self):
+        return str(self)
 
     def __str__(self):
-        return self.ip
+        if self._text is None:
+            self._text = number_to_str(self.number)
+        return self._text
+
+    def __repr__(self):
+        return f"IPAddress('{self}')"
+
+    def __int__(self):
+        return self.number
+
+    def __hash__(self):
+        return hash(self.number)
+
+    def __eq__(self, other):
+        if type(other) is not IPAddress:
+            return NotImplemented
+        return self.number == other.number
+
+    def __lt__(self, other):
+        if type(other) is not IPAddress:
+            return NotImplemented
+        return self.number < other.number
+
+    def __le__(self, other):
+        if type(other) is not IPAddress:
+            return NotImplemented
+        return self.number <= other.number
+
+    def __gt__(self, other):
+        if type(other) is not IPAddress:
+            return NotImplemented
+        return self.number > other.number
+
+    def __ge__(self, other):
+        if type(other) is not IPAddress:
+            return NotImplemented
+        return self.number >= other.number
 
     def get_class(self):
-        first_byte = int(self.ip.split(".")[0])
+        first_byte = self.number >> 24
 
         if not first_byte & 0x80:
             return 'A'
@@ -43,16 +118,93 @@ class IPAddress():
             return 'E'
 
     def to_number(self):
-        values = self.ip.split(".")
-        number = 0
-        for byte in values:
-            number = number*256 + int(byte)
-
-        return number
+        return self.number
 
     def from_number(self, number):
-        self.ip = str(number % 256)
-        number = number // 256
-        for i in range(3):
-            self.ip = str(number % 256) + '.' + self.ip
-            number = number // 256
+        """Changes the address to a number (only its lowest 32 bits are used). Deprecated: addresses are
+        hashable and changing one used as a key or in a set corrupts it, use IPAddress(number) instead."""
+        warnings.warn("IPAddress.from_number is deprecated, use IPAddress(number) instead", DeprecationWarning,
+                      stacklevel=2)
+        self.number = number & 0xffffffff
+        self._text = None
+
+
+# Batch API: whole arrays of addresses at once (requires numpy)
+
+def __check_numpy():
+    if np is None:
+        raise IPAddressException("numpy module is required for the batch API")
+
+
+def __char_codes(ips):
+    """Characters of every address as a (16, n) matrix of codes, 0 after the end of the string. Longer
+    strings are cut, but they keep the last row busy so they can be rejected."""
+    ips = np.asarray(ips if isinstance(ips, np.ndarray) else list(ips))
+    if ips.dtype.kind == "S":
+        codes = ips.astype("S16").view(np.uint8).reshape(len(ips), 16)
+    else:
+        # Non ASCII characters become 255, which is not valid anywhere
+        codes = np.minimum(ips.astype("U16").view(np.uint32).reshape(len(ips), 16), 255).astype(np.uint8)
+    return np.ascontiguousarray(codes.T)
+
+
+def to_numbers(ips):
+    """Parses an iterable or array of dotted strings (str or bytes). Returns a uint32 array with the
+    numbers and a bool array telling which entries are valid (invalid ones are 0, nothing is raised).
+    The rules are the same as IPAddress: four fields of 1 to 3 digits up to 255 (but, as numpy does, a
+    string ends at its first NUL character)."""
+    __check_numpy()
+    codes = __char_codes(ips)
+    end = codes == 0
+    dot = codes == 46
+    value = (codes - 48).astype(np.uint32)
+    digit = value < 10
+    # Only digits and three dots, padding only at the end, and no empty fields
+    valid = (end | dot | digit).all(axis=0) & end[15] & (dot.sum(axis=0) == 3) & ~dot[0]
+    valid &= ~(end[:-1] & ~end[1:]).any(axis=0) & ~(dot[:-1] & (dot[1:] | end[1:])).any(axis=0)
+
+    # Row by row, so the loop runs 16 times whatever the number of addresses
+    number = np.zeros(codes.shape[1], dtype=np.uint32)
+    field = np.zeros(codes.shape[1], dtype=np.uint32)
+    digits = np.zeros(codes.shape[1], dtype=np.uint32)
+    for j in range(16):
+        d, p = digit[j], dot[j]
+        valid &= ~p | (field <= 255)
+        number += p * (number * np.uint32(255) + field)
+        field *= ~p
+        field += d * (field * np.uint32(9) + value[j])
+        digits = (digits + d) * ~p
+        valid &= digits <= 3
+    valid &= field <= 255
+    return np.where(valid, number * np.uint32(256) + field, 0).astype(np.uint32), valid
+
+
+def from_numbers(numbers):
+    """Dotted strings of an array of numbers."""
+    __check_numpy()
+    numbers = np.asarray(numbers, dtype=np.uint32)
+    octets = np.array([str(i) for i in range(256)])
+    res = octets[numbers >> 24]
+    for shift in (16, 8, 0):
+        res = np.char.add(np.char.add(res, "."), octets[(numbers >> shift) & 0xff])
+    return res
+
+
+# Class of an address by its first byte
+_CLASSES = ["A"] * 128 + ["B"] * 64 + ["C"] * 32 + ["D"] * 16 + ["E"] * 16
+
+
+def get_classes(numbers, valid=None):
+    """Class (A to E) of an array of numbers, an empty string for the entries that are not valid."""
+    __check_numpy()
+    numbers = np.asarray(numbers, dtype=np.uint32)
+    res = np.array(_CLASSES)[numbers >> 24]
+    if valid is not None:
+        res[~np.asarray(valid, dtype=bool)] = ""
+    return res
+
+
+def classify(ips):
+    """Parses and classifies an iterable or array of dotted strings. Returns (classes, valid)."""
+    numbers, valid = to_numbers(ips)
+    return get_classes(numbers, valid), valid
@@ -0,0 +1,123 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class LossModelException(Exception):
+    pass
+
+
+class FixedLoss():
+    """Losses given as the list of transmissions (1, 2...) that are lost."""
+
+    def __init__(self, lost):
+        self.lost = set(lost)
+
+    def is_lost(self, n):
+        return n in self.lost
+
+
+class RandomLoss():
+    """Losses drawn in batches by draw (a function returning size booleans) and kept as a byte per
+    transmission, so each lookup is an index. Transmissions are asked in order, so the ones already asked
+    are dropped on every refill."""
+
+    batch = 4096
+
+    def __init__(self, draw):
+        self.draw = draw
+        self.lost = bytearray()
+        self.offset = 0
+
+    def is_lost(self, n):
+        if n > self.offset + len(self.lost):
+            del self.lost[:max(0, n - 1 - self.offset)]
+            self.offset = max(self.offset, n - 1)
+            while n > self.offset + len(self.lost):
+                self.lost += self.draw(self.batch).astype(np.uint8).tobytes()
+        return self.lost[n - 1 - self.offset]
+
+
+class BernoulliLoss(RandomLoss):
+    def __init__(self, probability, rng):
+        super().__init__(lambda size: rng.random(size) < probability)
+        self.probability = probability
+
+
+class GilbertElliottLoss(RandomLoss):
+    """Two state (good/bad) bursty channel. p is the probability of going from good to bad and r from
+    bad to good; each state loses with its own probability. The channel starts in the good state."""
+
+    def __init__(self, p, r, good_loss, bad_loss, rng):
+        super().__init__(self.__draw)
+        self.rng = rng
+        self.p = p
+        self.r = r
+        self.loss = np.array([good_loss, bad_loss])
+        self.pending = np.zeros(0, dtype=np.uint8)
+
+    def __states(self, size):
+        # The time spent in each state is geometric, so whole runs are drawn at once. Every block starts
+        # in the good state and ends in the bad one, so blocks can be chained.
+        parts = [self.pending]
+        total = len(self.pending)
+        runs = 64
+        states = np.tile(np.array([0, 1], dtype=np.uint8), runs)
+        while total < size:
+            lengths = np.empty(2 * runs, dtype=np.int64)
+            lengths[0::2] = self.rng.geometric(self.p, runs)
+            lengths[1::2] = self.rng.geometric(self.r, runs)
+            block = np.repeat(states, lengths)
+            parts.append(block)
+            total += len(block)
+        states = np.concatenate(parts)
+        self.pending = states[size:]
+        return states[:size]
+
+    def __draw(self, size):
+        return self.rng.random(size) < self.loss[self.__states(size)]
+
+
+def check_probability(spec, key, default=None):
+    v = spec.get(key, default)
+    if type(v) not in (int, float) or v < 0 or v > 1:
+        raise LossModelException(f"{key} should be a probability between 0 and 1")
+    return v
+
+
+def check_loss(spec, key, default=None):
+    """Like check_probability, but a loss of 1 is rejected: every retransmission would be lost too and the
+    simulation would never end."""
+    v = check_probability(spec, key, default)
+    if v == 1:
+        raise LossModelException(f"{key} should be lower than 1 (every transmission would be lost)")
+    return v
+
+
+def check_model(spec):
+    if type(spec) is not dict:
+        raise LossModelException("A loss model should be a dictionary")
+    model = spec.get("model", "")
+    if model == "bernoulli":
+        check_loss(spec, "probability")
+    elif model == "gilbert-elliott":
+        if check_probability(spec, "p") == 0 or check_probability(spec, "r") == 0:
+            raise LossModelException("p and r should be greater than 0")
+        good_loss = check_probability(spec, "good loss", 0)
+        if check_probability(spec, "bad loss", 1) == 1 and good_loss == 1:
+            raise LossModelException("good loss and bad loss can not be both 1 (every transmission would be lost)")
+    else:
+        raise LossModelException(f"The loss model ({model}) is no valid (bernoulli or gilbert-elliott)")
+    if np is None:
+        raise LossModelException("numpy module is required for random loss models")
+
+
+def make_rng(seed=None):
+    return np.random.default_rng(seed)
+
+
+def build_model(spec, rng):
+    if spec["model"] == "bernoulli":
+        return BernoulliLoss(spec["probability"], rng)
+    return GilbertElliottLoss(spec["p"], spec["r"], spec.get("good loss", 0), spec.get("bad loss", 1), rng)
@@ -1,59 +1,217 @@
-import re
-import requests
+import sys
+sys.path.append('..')
+from utils import ouilib, vendorlib
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
 
 class MACAddressException(Exception):
     pass
 
 
+def parse_mac(mac):
+    """48 bit number of a MAC written as 6 groups of two hexadecimal digits separated by :, - or .,
+    as 3 groups of four digits separated by . (Cisco) or as 12 digits without separators."""
+    if type(mac) is not str:
+        raise MACAddressException("MAC incorrecta")
+    if len(mac) == 17:
+        sep = mac[2]
+        if sep not in ":-." or mac[2::3] != sep * 5:
+            raise MACAddressException("MAC incorrecta")
+        digits = mac.replace(sep, "")
+    elif len(mac) == 14:
+        if mac[4::5] != "..":
+            raise MACAddressException("MAC incorrecta")
+        digits = mac.replace(".", "")
+    else:
+        digits = mac
+    # Besides being hexadecimal, this rejects separators in the wrong places or mixed separators
+    if len(digits) != 12 or not _HEX_DIGITS.issuperset(digits):
+        raise MACAddressException("MAC incorrecta")
+    return int(digits, 16)
+
+
+def number_to_str(number):
+    digits = f"{number & 0xffffffffffff:012x}"
+    return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
 class MACAddress():
+    """MAC address stored as a 48 bit number. It can be built from its text (any of the formats of
+    parse_mac) or its number and is always written in lowercase with : as separator."""
+
+    __slots__ = ("number", "_text")
+
     def __init__(self, mac):
-        if not self.__check_mac(mac):
-            raise MACAddressException("MAC incorrecta")
-        self.mac = mac.replace("-",":").replace(".",":").lower()
-
-    def __check_mac(self, mac):
-        sep_counter = 0
-        if mac.find(":") > 0:
-            sep_counter += 1
-        if mac.find(".") > 0:
-            sep_counter += 1
-        if mac.find("-") > 0:
-            sep_counter += 1
-        if sep_counter != 1:
-            return False
-        mac = mac.replace("-",":").replace(".",":").lower()
-        return re.search(r"^([0-9a-f]{2}:){5}[0-9a-f]{2}$", mac)
+        if type(mac) is int:
+            if mac < 0 or mac > 0xffffffffffff:
+                raise MACAddressException("MAC incorrecta")
+            self.number = mac
+        else:
+            self.number = parse_mac(mac)
+        self._text = None
+
+    @property
+    def mac(self):
+        return str(self)
 
     def __str__(self):
-        return self.mac
+        if self._text is None:
+            self._text = number_to_str(self.number)
+        return self._text
+
+    def __repr__(self):
+        return f"MACAddress('{self}')"
+
+    def __int__(self):
+        return self.number
+
+    def __hash__(self):
+        return hash(self.number)
+
+    def __eq__(self, other):
+        if type(other) is not MACAddress:
+            return NotImplemented
+        return self.number == other.number
+
+    def __lt__(self, other):
+        if type(other) is not MACAddress:
+            return NotImplemented
+        return self.number < other.number
+
+    def __le__(self, other):
+        if type(other) is not MACAddress:
+            return NotImplemented
+        return self.number <= other.number
+
+    def __gt__(self, other):
+        if type(other) is not MACAddress:
+            return NotImplemented
+        return self.number > other.number
+
+    def __ge__(self, other):
+        if type(other) is not MACAddress:
+            return NotImplemented
+        return self.number >= other.number
 
     def get_vendor_id(self):
-        vendor = self.mac[:len(self.mac)//2]
-        vendor = vendor[0] + hex(int(vendor[1],16) & 0xc)[-1] + vendor[2:]
-        return vendor
-
-    def get_vendor_name(self):
-        url = "https://macvendors.co/api/vendorname/"+self.get_vendor_id()
-        response = requests.get(url)
-        if response.status_code != 200:
+        # The multicast and local bits are not part of the OUI
+        return number_to_str(self.number & ~(0x03 << 40))[:8]
+
+    def to_number(self):
+        return self.number
+
+    def get_vendor_name(self, online=True):
+        """Looks the vendor up in the local database (see tools/oui-db.py) and, if it is not there and
+        online is True, asks the macvendors API through the cached client of vendorlib."""
+        try:
+            database = ouilib.default_database()
+        except ouilib.OUIDatabaseException:
+            # A corrupted or truncated database is taken as no database
+            database = None
+        if database is not None:
+            vendor = database.lookup(self.number & ~(0x03 << 40))
+            if vendor is not None:
+                return vendor
+        if not online:
+            return None
+        try:
+            return vendorlib.default_client().lookup(self.get_vendor_id())
+        except vendorlib.VendorLookupException:
             return None
-        else:
-            return response.text
 
     def get_serial_number(self):
-        return self.mac[len(self.mac)//2 + 1:]
+        return str(self)[9:]
 
     def is_local(self):
-        return int(self.mac[1], 16) & 0x2
+        return bool(self.number & (0x02 << 40))
 
     def is_global(self):
         return not self.is_local()
 
     def is_multicast(self):
-        return int(self.mac[1], 16) & 0x1
+        return bool(self.number & (0x01 << 40))
 
     def is_unicast(self):
         return not self.is_multicast()
 
     def is_broadcast(self):
-        return self.mac == "ff:ff:ff:ff:ff:ff"
+        return self.number == 0xffffffffffff
+
+
+# Batch API: whole arrays of addresses at once (requires numpy)
+
+def __check_numpy():
+    if np is None:
+        raise MACAddressException("numpy module is required for the batch API")
+
+
+# Value of every character code as a hexadecimal digit, 255 if it is not one
+_NIBBLES = bytes(int(chr(c), 16) if chr(c) in _HEX_DIGITS else 255 for c in range(256))
+# Positions of the digits and of the separators of every format, by length of the text
+_LAYOUTS = {17: ([i for i in range(17) if i % 3 != 2], list(range(2, 17, 3))),
+            14: ([i for i in range(14) if i % 5 != 4], [4, 9]),
+            12: (list(range(12)), [])}
+
+
+def to_numbers(macs):
+    """Parses an iterable or array of MACs (str or bytes) in any of the formats of parse_mac. Returns a
+    uint64 array with the numbers and a bool array telling which entries are valid (invalid ones are 0,
+    nothing is raised)."""
+    __check_numpy()
+    macs = np.asarray(macs if isinstance(macs, np.ndarray) else list(macs))
+    n = len(macs)
+    # One more column than the longest format, so longer strings are not cut to a valid length
+    if macs.dtype.kind == "S":
+        codes = macs.astype("S18").view(np.uint8).reshape(n, 18)
+    else:
+        # Non ASCII characters become 255, which is not valid anywhere
+        codes = np.minimum(macs.astype("U18").view(np.uint32).reshape(n, 18), 255).astype(np.uint8)
+    codes = np.ascontiguousarray(codes.T)
+    length = np.where((codes == 0).any(axis=0), (codes != 0).argmin(axis=0), 18)
+    nibbles = np.frombuffer(_NIBBLES, dtype=np.uint8)[codes]
+
+    numbers = np.zeros(n, dtype=np.uint64)
+    valid = np.zeros(n, dtype=bool)
+    for size, (digits, separators) in _LAYOUTS.items():
+        rows = length == size
+        if not rows.any():
+            continue
+        ok = rows & (nibbles[digits] < 16).all(axis=0)
+        if separators:
+            sep = codes[separators[0]]
+            ok &= (codes[separators] == sep).all(axis=0)
+            ok &= (sep == 46) if size == 14 else ((sep == 58) | (sep == 45) | (sep == 46))
+        number = np.zeros(n, dtype=np.uint64)
+        for i in digits:
+            number = (number << np.uint64(4)) | nibbles[i]
+        numbers = np.where(ok, number, numbers)
+        valid |= ok
+    return numbers, valid
+
+
+def from_numbers(numbers):
+    """Text (lowercase, : as separator) of an array of numbers."""
+    __check_numpy()
+    numbers = np.asarray(numbers, dtype=np.uint64)
+    octets = np.array([f"{i:02x}" for i in range(256)])
+    res = octets[(numbers >> np.uint64(40)) & np.uint64(0xff)]
+    for shift in (32, 24, 16, 8, 0):
+        res = np.char.add(np.char.add(res, ":"), octets[(numbers >> np.uint64(shift)) & np.uint64(0xff)])
+    return res
+
+
+def get_fields(numbers):
+    """Splits an array of numbers into (OUI, serial number, multicast, local): the OUIs (without the
+    multicast and local bits, as get_vendor_id) and serial numbers as uint32 arrays and the I/G and U/L
+    bits as bool arrays."""
+    __check_numpy()
+    numbers = np.asarray(numbers, dtype=np.uint64)
+    first = (numbers >> np.uint64(40)).astype(np.uint32)
+    oui = (numbers >> np.uint64(24)).astype(np.uint32) & np.uint32(0xfcffff)
+    serial = (numbers & np.uint64(0xffffff)).astype(np.uint32)
+    return oui, serial, (first & 1).astype(bool), (first & 2).astype(bool)
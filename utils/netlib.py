@@ -1,5 +1,5 @@
 import sys
-import re
+from functools import lru_cache
 sys.path.append('..')
 from utils import iplib
 
@@ -8,44 +8,42 @@ class NetworkException(Exception):
     pass
 
 
+@lru_cache(maxsize=256, typed=True)
+def mask_info(netmask):
+    """(prefix, mask as a number) of a prefix or a dotted mask. Networks usually share a few masks, so
+    the result is remembered."""
+    if type(netmask) is int:
+        if netmask < 0 or netmask > 32:
+            raise NetworkException("Netmask prefix should be a number between 0 and 32")
+        return netmask, (0xffffffff << (32 - netmask)) & 0xffffffff
+    elif type(netmask) is str:
+        try:
+            mask = iplib.IPAddress(netmask).number
+        except iplib.IPAddressException:
+            raise NetworkException("Netmask is not valid (it should be a mask or a prefix)")
+        # A mask is a run of ones followed by zeros, so its complement plus one is a power of two
+        hosts = (~mask & 0xffffffff) + 1
+        if hosts & (hosts - 1):
+            raise NetworkException(f"{netmask} is not a valid network mask")
+        return 32 - (hosts.bit_length() - 1), mask
+    else:
+        raise NetworkException("Netmask is not valid (it should be a mask or a prefix)")
+
+
 class Network():
     def __init__(self, ip, netmask):
         try:
             ipa = iplib.IPAddress(ip)
         except iplib.IPAddressException:
             raise NetworkException(f"{ip} is not a valid IP Address")
-
-        mask = iplib.IPAddress("255.255.255.255")
-
-        if type(netmask) is int:
-            self.prefix = int(netmask)
-            if netmask < 0 or netmask > 32:
-                raise NetworkException("Netmask prefix should be a number between 0 and 32")
-            self.wildcard = 32 - self.prefix
-            n = mask.to_number()
-            mask.from_number((n << self.wildcard) & n)
-            self.netmask = mask
-        elif type(netmask) is str:
-            try:
-                self.netmask = iplib.IPAddress(netmask)
-                valid, self.prefix = self.__check_mask(self.netmask.to_number())
-                if not valid:
-                    raise NetworkException(f"{netmask} is not a valid network mask")
-                self.wildcard = 32 - self.prefix
-            except iplib.IPAddressException:
-                raise NetworkException("Netmask is not valid (it should be a mask or a prefix)")
-        else:
+        if type(netmask) not in (int, str):
             raise NetworkException("Netmask is not valid (it should be a mask or a prefix)")
 
-        ipa.from_number(ipa.to_number() & self.netmask.to_number())
-        self.netid = ipa
-
-    def __check_mask(self, mask):
-        bin_str = '{0:032b}'.format(mask)
-        regexp = re.search(r"^(1*)0*$", bin_str)
-        if not regexp:
-            return False,0
-        return True, len(regexp.group(1))
+        self.prefix, mask = mask_info(netmask)
+        self.wildcard = 32 - self.prefix
+        self.netmask = iplib.IPAddress(mask)
+        self.size = 1 << self.wildcard
+        self.netid = iplib.IPAddress(ipa.number & mask)
 
     def get_id(self):
         return str(self.netid)
@@ -57,22 +55,16 @@ class Network():
         return self.prefix
 
     def get_broadcast(self):
-        ipa = iplib.IPAddress("0.0.0.0")
-        ipa.from_number(self.netid.to_number() + 2**self.wildcard - 1)
-        return str(ipa)
+        return iplib.number_to_str(self.netid.number + self.size - 1)
 
     def get_first_host_ip(self):
-        ipa = iplib.IPAddress("0.0.0.0")
-        ipa.from_number(self.netid.to_number() + 1)
-        return str(ipa)
+        return iplib.number_to_str(self.netid.number + 1)
 
     def get_last_host_ip(self):
-        ipa = iplib.IPAddress("0.0.0.0")
-        ipa.from_number(self.netid.to_number() + 2**self.wildcard - 2)
-        return str(ipa)
+        return iplib.number_to_str(self.netid.number + self.size - 2)
 
     def get_number_of_hosts(self):
-        return 2**self.wildcard - 2
+        return self.size - 2
 
     def __str__(self):
         return str(self.netid) + '/' + str(self.prefix)
\ No newline at end of file
@@ -0,0 +1,235 @@
+import sys
+from bisect import bisect_right
+try:
+    import numpy as np
+except ImportError:
+    np = None
+sys.path.append('..')
+from utils import iplib, netlib
+
+
+# Lines parsed at once when reading files with numpy available
+CHUNK = 65536
+
+
+class NetworkSetException(Exception):
+    pass
+
+
+def parse_network(text):
+    """(first address, last address + 1) of a network written as ip/prefix, ip/mask, "ip mask" or a
+    single ip. Host bits are cleared, as netlib.Network does."""
+    text = text.strip()
+    if "/" in text:
+        ip, mask = text.split("/", 1)
+    elif " " in text or "\t" in text:
+        ip, mask = text.split(None, 1)
+    else:
+        ip, mask = text, "32"
+    try:
+        number = iplib.parse_ip(ip)
+    except iplib.IPAddressException:
+        raise NetworkSetException(f"{ip} is not a valid IP Address")
+    mask = mask.strip()
+    if mask.isascii() and mask.isdigit():
+        prefix = int(mask)
+        if prefix > 32:
+            raise NetworkSetException("Netmask prefix should be a number between 0 and 32")
+    else:
+        try:
+            prefix = netlib.Network(ip, mask).prefix
+        except netlib.NetworkException as e:
+            raise NetworkSetException(str(e))
+    size = 1 << (32 - prefix)
+    start = number & ~(size - 1)
+    return start, start + size
+
+
+def cidr_blocks(start, end):
+    """Yields the minimal list of (network id, prefix) covering the addresses [start, end)."""
+    while start < end:
+        # The biggest block aligned at start that does not go past end
+        size = start & -start if start else 1 << 32
+        while size > end - start:
+            size >>= 1
+        yield start, 33 - size.bit_length()
+        start += size
+
+
+def merge_arrays(starts, ends):
+    """Same as merge for numpy arrays of starts and ends: an interval begins a new one only when it
+    starts after every previous interval has ended."""
+    if len(starts) == 0:
+        return []
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] > reach[:-1]
+    groups = np.flatnonzero(first)
+    last = np.append(groups[1:], len(starts)) - 1
+    return list(zip(starts[groups].tolist(), reach[last].tolist()))
+
+
+def merge(intervals):
+    """Sorted and disjoint version of a list of (start, end) intervals (touching ones are joined)."""
+    res = []
+    for start, end in sorted(intervals):
+        if res and start <= res[-1][1]:
+            if end > res[-1][1]:
+                res[-1] = (res[-1][0], end)
+        else:
+            res.append((start, end))
+    return res
+
+
+class NetworkSet():
+    """Set of IPv4 addresses kept as sorted disjoint intervals [start, end) of numbers. Building a set
+    sorts its input (O(n log n)) and every set operation is a merge of two sorted lists (O(n + m))."""
+
+    __slots__ = ("intervals",)
+
+    def __init__(self, networks=()):
+        intervals = []
+        for net in networks:
+            if type(net) is netlib.Network:
+                intervals.append((net.netid.number, net.netid.number + (1 << net.wildcard)))
+            else:
+                intervals.append(parse_network(net))
+        self.intervals = merge(intervals)
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        res = cls()
+        res.intervals = merge(intervals)
+        return res
+
+    @classmethod
+    def from_file(cls, f):
+        """Reads a network per line from a file object (empty lines and # comments are skipped). Lines
+        are parsed as they are read, so only the intervals are kept in memory. With numpy the ip/prefix
+        lines are parsed and merged in bulk."""
+        intervals = []
+        if np is not None:
+            starts, ends = [], []
+            ips, prefixes, numbers = [], [], []
+        for n, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if np is not None:
+                ip, sep, prefix = line.partition("/")
+                if sep and prefix.isascii() and prefix.isdigit() and int(prefix) <= 32:
+                    ips.append(ip)
+                    prefixes.append(int(prefix))
+                    numbers.append(n)
+                    if len(ips) == CHUNK:
+                        cls.__parse_chunk(ips, prefixes, numbers, starts, ends)
+                        ips, prefixes, numbers = [], [], []
+                    continue
+            try:
+                intervals.append(parse_network(line))
+            except NetworkSetException as e:
+                raise NetworkSetException(f"Line {n}: {e}")
+        res = cls()
+        if np is None:
+            res.intervals = merge(intervals)
+            return res
+        cls.__parse_chunk(ips, prefixes, numbers, starts, ends)
+        starts.append(np.array([s for s, _ in intervals], dtype=np.int64))
+        ends.append(np.array([e for _, e in intervals], dtype=np.int64))
+        res.intervals = merge_arrays(np.concatenate(starts), np.concatenate(ends))
+        return res
+
+    @staticmethod
+    def __parse_chunk(ips, prefixes, numbers, starts, ends):
+        addresses, valid = iplib.to_numbers(ips)
+        if not valid.all():
+            i = int(np.argmin(valid))
+            raise NetworkSetException(f"Line {numbers[i]}: {ips[i]} is not a valid IP Address")
+        sizes = np.int64(1) << (32 - np.array(prefixes, dtype=np.int64))
+        first = addresses.astype(np.int64) & ~(sizes - 1)
+        starts.append(first)
+        ends.append(first + sizes)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __eq__(self, other):
+        if type(other) is not NetworkSet:
+            return NotImplemented
+        return self.intervals == other.intervals
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def number_of_addresses(self):
+        return sum(end - start for start, end in self.intervals)
+
+    def union(self, other):
+        # Both lists are sorted runs, so the sort inside merge only has to merge them
+        res = NetworkSet()
+        res.intervals = merge(self.intervals + other.intervals)
+        return res
+
+    def intersection(self, other):
+        res = NetworkSet()
+        b = other.intervals
+        j = 0
+        for start, end in self.intervals:
+            # Intervals of other that end before this one starts can not meet any later one either
+            while j < len(b) and b[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] < end:
+                res.intervals.append((max(start, b[k][0]), min(end, b[k][1])))
+                k += 1
+        return res
+
+    def difference(self, other):
+        res = NetworkSet()
+        b = other.intervals
+        j = 0
+        for start, end in self.intervals:
+            # Same walk as intersection, keeping the gaps instead of the overlaps
+            while j < len(b) and b[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] < end:
+                if b[k][0] > start:
+                    res.intervals.append((start, b[k][0]))
+                start = max(start, b[k][1])
+                k += 1
+            if start < end:
+                res.intervals.append((start, end))
+        return res
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def summarize(self):
+        """Minimal list of networks (as netlib.Network) covering exactly the set."""
+        return [netlib.Network(netid, prefix) for start, end in self.intervals
+                for netid, prefix in cidr_blocks(start, end)]
+
+    def cidrs(self):
+        """Same as summarize, but yields the networks as ip/prefix strings."""
+        for start, end in self.intervals:
+            for netid, prefix in cidr_blocks(start, end):
+                yield f"{iplib.number_to_str(netid)}/{prefix}"
+
+    def __contains__(self, item):
+        """Membership of an address (str, number or IPAddress) or of a whole network."""
+        if type(item) is netlib.Network:
+            start, end = item.netid.number, item.netid.number + (1 << item.wildcard)
+        elif type(item) is str and "/" in item:
+            start, end = parse_network(item)
+        else:
+            try:
+                start = iplib.parse_ip(item) if type(item) is str else int(item)
+            except iplib.IPAddressException:
+                raise NetworkSetException(f"{item} is not a valid IP Address")
+            end = start + 1
+        i = bisect_right(self.intervals, (start, 1 << 33)) - 1
+        return i >= 0 and self.intervals[i][0] <= start and end <= self.intervals[i][1]
@@ -0,0 +1,199 @@
+import os
+import sys
+import re
+import csv
+import mmap
+import struct
+from bisect import bisect_left
+
+MAGIC = b"OUI1"
+# Block sizes of the IEEE registries: MA-L (OUI), MA-M and MA-S (OUI-36)
+PREFIXES = (24, 28, 36)
+# Magic, number of blocks of each size, number of names and padding so the keys are 8 byte aligned
+HEADER = struct.Struct("<4s5I")
+# Default location of the database built with tools/oui-db.py
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "oui.bin")
+
+
+class OUIDatabaseException(Exception):
+    pass
+
+
+# Registry parsing
+
+_HEX_LINE = re.compile(r"^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s*(.*)$")
+_BASE16_LINE = re.compile(r"^\s*([0-9A-Fa-f]{6})(?:-([0-9A-Fa-f]{6}))?\s+\(base 16\)")
+
+
+def parse_text_registry(f):
+    """Yields (prefix length, block number, organization) from the text registries published by the IEEE
+    (oui.txt, mam.txt, oui36.txt). MA-L blocks list the OUI in the (base 16) line, MA-M and MA-S blocks
+    list the range of the next 24 bits they own."""
+    oui = name = None
+    for line in f:
+        m = _HEX_LINE.match(line)
+        if m:
+            oui = int(m.group(1) + m.group(2) + m.group(3), 16)
+            name = m.group(4).strip()
+            continue
+        m = _BASE16_LINE.match(line)
+        if m and oui is not None:
+            if m.group(2) is None:
+                yield 24, oui, name
+            else:
+                start, end = int(m.group(1), 16), int(m.group(2), 16)
+                bits = 24 - (end - start + 1).bit_length() + 1
+                yield 24 + bits, (oui << bits) | (start >> (24 - bits)), name
+            oui = None
+
+
+def parse_csv_registry(f):
+    """Yields (prefix length, block number, organization) from the CSV registries published by the IEEE
+    (Registry, Assignment, Organization Name, Organization Address)."""
+    for row in csv.reader(f):
+        if len(row) < 3 or row[0] == "Registry":
+            continue
+        assignment = row[1].strip()
+        try:
+            yield 4 * len(assignment), int(assignment, 16), row[2].strip()
+        except ValueError:
+            continue
+
+
+def parse_registry(filename):
+    with open(filename, encoding="utf-8", errors="replace") as f:
+        first = f.readline()
+        f.seek(0)
+        if first.startswith("Registry,"):
+            yield from parse_csv_registry(f)
+        else:
+            yield from parse_text_registry(f)
+
+
+def build(filenames, output):
+    """Imports IEEE registry files (text or CSV) into a binary database. The file has a header with the
+    number of blocks of each size and of names, the sorted block numbers of every size (uint64), the
+    index of the name of every block (uint32), and finally the offsets of the names and the names
+    (UTF-8). Numbers are little endian. Returns the number of blocks."""
+    blocks = {p: {} for p in PREFIXES}
+    for filename in filenames:
+        for prefix, number, name in parse_registry(filename):
+            if prefix in blocks:
+                blocks[prefix][number] = name
+
+    names = {}
+    for p in PREFIXES:
+        for name in blocks[p].values():
+            names.setdefault(name, len(names))
+    encoded = [name.encode() for name in names]
+    offsets = [0]
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+
+    keys = {p: sorted(blocks[p]) for p in PREFIXES}
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, *(len(keys[p]) for p in PREFIXES), len(names), 0))
+        for p in PREFIXES:
+            f.write(struct.pack(f"<{len(keys[p])}Q", *keys[p]))
+        for p in PREFIXES:
+            f.write(struct.pack(f"<{len(keys[p])}I", *(names[blocks[p][k]] for k in keys[p])))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b"".join(encoded))
+    return sum(len(blocks[p]) for p in PREFIXES)
+
+
+# Lookups
+
+class _Keys:
+    """Sorted uint64 array inside the mapped file, indexable so bisect can search it in place. Only
+    used on big endian machines, elsewhere a memoryview of the file does the same much faster."""
+
+    def __init__(self, data, offset, count):
+        self.data = data
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from("<Q", self.data, self.offset + 8 * i)[0]
+
+
+class OUIDatabase:
+    """Vendor database built with build(). The file is memory mapped, so opening it costs nothing and
+    each lookup is a binary search per block size (longest prefix first) reading only a few pages."""
+
+    def __init__(self, filename):
+        try:
+            with open(filename, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise OUIDatabaseException(f"The vendor database {filename} can not be opened ({e})")
+        if len(self.data) < HEADER.size:
+            raise OUIDatabaseException(f"{filename} is not a vendor database")
+        magic, *counts, self.number_of_names, _ = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise OUIDatabaseException(f"{filename} is not a vendor database")
+        self.sections = []
+        offset = HEADER.size
+        names = offset + 8 * sum(counts)
+        for prefix, count in zip(PREFIXES, counts):
+            if sys.byteorder == "little":
+                keys = memoryview(self.data)[offset:offset + 8 * count].cast("Q")
+            else:
+                keys = _Keys(self.data, offset, count)
+            self.sections.append((prefix, keys, names))
+            offset += 8 * count
+            names += 4 * count
+        self.offsets = names
+        self.names = self.offsets + 4 * (self.number_of_names + 1)
+
+    def __len__(self):
+        return sum(len(keys) for _, keys, _ in self.sections)
+
+    def close(self):
+        # The views of the keys have to be released before the map can be closed
+        for _, keys, _ in self.sections:
+            if type(keys) is memoryview:
+                keys.release()
+        self.data.close()
+
+    def name(self, index):
+        start, end = struct.unpack_from("<2I", self.data, self.offsets + 4 * index)
+        return self.data[self.names + start:self.names + end].decode()
+
+    def lookup(self, mac):
+        """Organization owning the most specific block of a MAC given as a 48 bit number, None if the
+        MAC is not in any assigned block."""
+        for prefix, keys, names in reversed(self.sections):
+            key = mac >> (48 - prefix)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                return self.name(struct.unpack_from("<I", self.data, names + 4 * i)[0])
+        return None
+
+
+_default = None
+# ((path, size, mtime), error message) of the last database that could not be opened
+_failed = None
+
+
+def default_database():
+    """Database at DEFAULT_DATABASE, opened once. None if it has not been built. A corrupted file raises
+    OUIDatabaseException, which is remembered until the file changes so it is not mapped on every call."""
+    global _default, _failed
+    if _default is None:
+        try:
+            st = os.stat(DEFAULT_DATABASE)
+        except OSError:
+            return None
+        key = (DEFAULT_DATABASE, st.st_size, st.st_mtime_ns)
+        if _failed is not None and _failed[0] == key:
+            raise OUIDatabaseException(_failed[1])
+        try:
+            _default = OUIDatabase(DEFAULT_DATABASE)
+        except OUIDatabaseException as e:
+            _failed = (key, str(e))
+            raise
+    return _default
@@ -0,0 +1,205 @@
+import sys
+import json
+try:
+    import numpy as np
+except ImportError:
+    np = None
+sys.path.append('..')
+from utils import iplib, netlib
+
+
+MAGIC = b"LPM1"
+
+
+class PrefixTableException(Exception):
+    pass
+
+
+class PrefixTable():
+    """Longest prefix match over netlib.Network objects.
+
+    There is a dictionary per prefix length (network id -> slot), so inserting, deleting and looking up
+    one address are a few dictionary operations. Each entry gets a slot and network(slot) and
+    values[slot] give its network and value. Batched lookups use, for every prefix length, the sorted
+    array of its network ids, which is rebuilt only when that length changes.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.ids = []
+        self.prefixes = []
+        self.values = []
+        # Network objects are built the first time they are asked for
+        self.networks = []
+        self.free = []
+        self.arrays = {}
+
+    @classmethod
+    def from_networks(cls, networks):
+        table = cls()
+        for net in networks:
+            table.insert(net)
+        return table
+
+    def __len__(self):
+        return len(self.ids) - len(self.free)
+
+    def __contains__(self, net):
+        return net.netid.number in self.tables.get(net.prefix, {})
+
+    def __iter__(self):
+        for slot, prefix in enumerate(self.prefixes):
+            if prefix >= 0:
+                yield self.network(slot), self.values[slot]
+
+    def network(self, slot):
+        if self.networks[slot] is None:
+            self.networks[slot] = netlib.Network(self.ids[slot], self.prefixes[slot])
+        return self.networks[slot]
+
+    def insert(self, net, value=None):
+        """Adds a network (or replaces the value of one already present). Returns its slot."""
+        if type(net) is not netlib.Network:
+            raise PrefixTableException("Only netlib.Network objects can be inserted")
+        table = self.tables.setdefault(net.prefix, {})
+        slot = table.get(net.netid.number)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                self.ids[slot] = net.netid.number
+                self.prefixes[slot] = net.prefix
+                self.networks[slot] = net
+                self.values[slot] = value
+            else:
+                slot = len(self.ids)
+                self.ids.append(net.netid.number)
+                self.prefixes.append(net.prefix)
+                self.networks.append(net)
+                self.values.append(value)
+            table[net.netid.number] = slot
+            self.arrays.pop(net.prefix, None)
+        else:
+            self.values[slot] = value
+        return slot
+
+    def delete(self, net):
+        table = self.tables.get(net.prefix, {})
+        slot = table.pop(net.netid.number, None)
+        if slot is None:
+            raise PrefixTableException(f"{net} is not in the table")
+        if not table:
+            del self.tables[net.prefix]
+        self.prefixes[slot] = -1
+        self.networks[slot] = None
+        self.values[slot] = None
+        self.free.append(slot)
+        self.arrays.pop(net.prefix, None)
+
+    def lookup_slot(self, ip):
+        """Slot of the most specific network containing ip (str, number or IPAddress), -1 if none."""
+        if type(ip) is str:
+            ip = iplib.IPAddress(ip)
+        number = int(ip)
+        for prefix in sorted(self.tables, reverse=True):
+            slot = self.tables[prefix].get(number & ((0xffffffff << (32 - prefix)) & 0xffffffff))
+            if slot is not None:
+                return slot
+        return -1
+
+    def lookup(self, ip):
+        """(network, value) of the most specific network containing ip, None if there is none."""
+        slot = self.lookup_slot(ip)
+        return None if slot < 0 else (self.network(slot), self.values[slot])
+
+    def __sorted_arrays(self, prefix):
+        if prefix not in self.arrays:
+            items = sorted(self.tables[prefix].items())
+            self.arrays[prefix] = (np.array([k for k, _ in items], dtype=np.uint32),
+                                   np.array([v for _, v in items], dtype=np.int64))
+        return self.arrays[prefix]
+
+    def lookup_many(self, ips):
+        """Slots of the most specific network of every address (-1 when there is none or the address is
+        not valid). ips can be dotted strings or an array of numbers."""
+        if np is None:
+            raise PrefixTableException("numpy module is required for batched lookups")
+        ips = np.asarray(ips if isinstance(ips, np.ndarray) else list(ips))
+        if ips.dtype.kind in "US":
+            numbers, valid = iplib.to_numbers(ips)
+        else:
+            numbers, valid = ips.astype(np.uint32), np.ones(len(ips), dtype=bool)
+        res = np.full(len(numbers), -1, dtype=np.int64)
+        # Masking keeps the order, so with the addresses sorted every search gets sorted keys
+        pending = np.flatnonzero(valid)
+        pending = pending[np.argsort(numbers[pending], kind="stable")]
+        for prefix in sorted(self.tables, reverse=True):
+            if len(pending) == 0:
+                break
+            ids, slots = self.__sorted_arrays(prefix)
+            keys = numbers[pending] & np.uint32((0xffffffff << (32 - prefix)) & 0xffffffff)
+            pos = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+            hit = ids[pos] == keys
+            res[pending[hit]] = slots[pos[hit]]
+            pending = pending[~hit]
+        return res
+
+    def save(self, filename):
+        """Writes the table as a binary snapshot: the number of networks of every prefix length, the
+        network ids ordered by prefix and id (so they are the lookup arrays when loaded) and the values
+        as JSON. Numbers are little endian uint32."""
+        if np is None:
+            raise PrefixTableException("numpy module is required for snapshots")
+        prefixes = sorted(self.tables)
+        ids = [self.__sorted_arrays(p) for p in prefixes]
+        counts = np.zeros(33, dtype="<u4")
+        for p, (a, _) in zip(prefixes, ids):
+            counts[p] = len(a)
+        try:
+            values = json.dumps([self.values[s] for p, (_, slots) in zip(prefixes, ids) for s in slots.tolist()])
+        except TypeError:
+            raise PrefixTableException("The values of the table should be JSON serializable")
+        values = values.encode()
+        with open(filename, "wb") as f:
+            f.write(MAGIC)
+            f.write(counts.tobytes())
+            for a, _ in ids:
+                f.write(a.astype("<u4").tobytes())
+            f.write(np.array([len(values)], dtype="<u4").tobytes())
+            f.write(values)
+
+    @classmethod
+    def load(cls, filename):
+        if np is None:
+            raise PrefixTableException("numpy module is required for snapshots")
+        with open(filename, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise PrefixTableException(f"{filename} is not a prefix table snapshot")
+        try:
+            counts = np.frombuffer(data, dtype="<u4", count=33, offset=4)
+            offset = 4 + 33 * 4
+            total = int(counts.sum())
+            all_ids = np.frombuffer(data, dtype="<u4", count=total, offset=offset).astype(np.uint32)
+            offset += total * 4
+            size = int(np.frombuffer(data, dtype="<u4", count=1, offset=offset)[0])
+            values = json.loads(data[offset + 4:offset + 4 + size])
+        except ValueError:
+            raise PrefixTableException(f"{filename} is corrupted")
+        if len(values) != total:
+            raise PrefixTableException(f"{filename} is corrupted")
+
+        table = cls()
+        table.ids = all_ids.tolist()
+        table.prefixes = np.repeat(np.arange(33), counts).tolist()
+        table.values = values
+        table.networks = [None] * total
+        start = 0
+        for prefix in range(33):
+            n = int(counts[prefix])
+            if n == 0:
+                continue
+            slots = np.arange(start, start + n, dtype=np.int64)
+            table.arrays[prefix] = (all_ids[start:start + n], slots)
+            table.tables[prefix] = dict(zip(table.ids[start:start + n], range(start, start + n)))
+            start += n
+        return table
@@ -0,0 +1,295 @@
+import os
+import time
+import heapq
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Bytes read at once from the field dumps
+BLOCK = 1 << 20
+# Files are split into ranges of at least this size to be aggregated in parallel
+MIN_RANGE = 16 << 20
+# Aggregations of a dump: (field of the MAC, 0 destination and 1 source; whether lengths or frames are added)
+AGGREGATIONS = {"src-bytes": (1, True), "src-frames": (1, False),
+                "dst-bytes": (0, True), "dst-frames": (0, False)}
+
+
+class TsharkOutputException(Exception):
+    pass
+
+
+def read_lines(f, block=BLOCK, size=None):
+    """Yields the lines of a file opened in binary mode, in lists, reading block bytes at a time (and
+    only size bytes from the current position if it is given). Only one block (plus an incomplete
+    line) is in memory whatever the size of the file."""
+    rest = b""
+    while size is None or size > 0:
+        data = f.read(block if size is None else min(block, size))
+        if not data:
+            break
+        if size is not None:
+            size -= len(data)
+        lines = (rest + data).split(b"\n")
+        rest = lines.pop()
+        yield lines
+    if rest:
+        yield [rest]
+
+
+def aggregate_lines(blocks, aggregation="src-bytes", totals=None):
+    """Adds up the lines of a dump made with tshark -T fields -e eth.dst -e eth.src -e frame.len (given
+    in lists as read_lines yields them) by MAC. Returns ({mac: total}, number of malformed lines);
+    malformed lines (for instance the ones of frames without Ethernet header, which have empty fields)
+    are skipped and blank lines ignored. The MACs are kept as bytes."""
+    if aggregation not in AGGREGATIONS:
+        raise TsharkOutputException(f"Unknown aggregation {aggregation} (it should be one of {', '.join(AGGREGATIONS)})")
+    field, weighted = AGGREGATIONS[aggregation]
+    totals = {} if totals is None else totals
+    malformed = 0
+    get = totals.get
+    for lines in blocks:
+        for line in lines:
+            fields = line.split()
+            if len(fields) != 3:
+                malformed += len(fields) > 0
+                continue
+            try:
+                length = int(fields[2])
+            except ValueError:
+                malformed += 1
+                continue
+            key = fields[field]
+            totals[key] = get(key, 0) + (length if weighted else 1)
+    return totals, malformed
+
+
+def split_ranges(filename, parts):
+    """Splits a file into at most parts (start, end) byte ranges that begin and end at line boundaries."""
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def aggregate_range(filename, start, end, aggregation="src-bytes"):
+    """aggregate_lines of the lines between two line boundaries of a file."""
+    with open(filename, "rb") as f:
+        f.seek(start)
+        return aggregate_lines(read_lines(f, size=end - start), aggregation)
+
+
+def aggregate_file(filename, aggregation="src-bytes", workers=None):
+    """Aggregates a whole dump. Big files are split into line aligned ranges which are aggregated by a
+    pool of workers processes (all the cores by default), each one with its own dictionary, and the
+    partial results are merged. Returns ({mac: total}, number of malformed lines)."""
+    if aggregation not in AGGREGATIONS:
+        raise TsharkOutputException(f"Unknown aggregation {aggregation} (it should be one of {', '.join(AGGREGATIONS)})")
+    workers = workers or os.cpu_count() or 1
+    # Some more ranges than workers, so a slow range does not leave the other cores idle
+    parts = max(1, min(4 * workers, os.path.getsize(filename) // MIN_RANGE))
+    if workers == 1 or parts == 1:
+        with open(filename, "rb") as f:
+            totals, malformed = aggregate_lines(read_lines(f), aggregation)
+    else:
+        ranges = split_ranges(filename, parts)
+        totals, malformed = {}, 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            futures = [pool.submit(aggregate_range, filename, start, end, aggregation) for start, end in ranges]
+            for future in futures:
+                partial, bad = future.result()
+                malformed += bad
+                get = totals.get
+                for k, v in partial.items():
+                    totals[k] = get(k, 0) + v
+    return {k.decode(errors="replace"): v for k, v in totals.items()}, malformed
+
+
+def top(totals, k=None):
+    """(mac, total) pairs sorted by total, only the k biggest if k is given."""
+    if k is None:
+        return sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    return heapq.nlargest(k, totals.items(), key=lambda x: x[1])
+
+
+# Live analysis
+
+class SpaceSaving:
+    """Heavy hitters of a stream in bounded memory (Space-Saving): at most capacity keys are counted.
+    When a new key arrives and there is no room, it replaces the key with the smallest count and
+    inherits that count, so a count overestimates the real one by at most errors[key] and every key
+    whose real total is above total / capacity is kept."""
+
+    def __init__(self, capacity=1024):
+        if capacity < 1:
+            raise TsharkOutputException("The capacity should be greater than 0")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # One (count, key) entry per key; counts only grow, so entries are refreshed when they reach the top
+        self.heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, weight=1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (weight, key))
+        else:
+            heap = self.heap
+            while heap[0][0] != counts[heap[0][1]]:
+                heapq.heapreplace(heap, (counts[heap[0][1]], heap[0][1]))
+            minimum, victim = heap[0]
+            del counts[victim]
+            del self.errors[victim]
+            counts[key] = minimum + weight
+            self.errors[key] = minimum
+            heapq.heapreplace(heap, (minimum + weight, key))
+
+    def top(self, k=None):
+        return top(self.counts, k)
+
+
+class LiveAggregate:
+    """Rolling per MAC byte and frame counters of a stream of tshark lines (destination, source and
+    length, optionally followed by frame.time_epoch), kept in Space-Saving sketches of capacity MACs,
+    and the top talkers of the last window seconds, kept in a sketch per slice of the window. Memory does
+    not depend on the number of MACs or frames."""
+
+    def __init__(self, key="src", capacity=1024, window=60, slices=12):
+        if key not in ("src", "dst"):
+            raise TsharkOutputException("Live aggregation is by src or dst")
+        if window <= 0 or slices < 1:
+            raise TsharkOutputException("The window and its number of slices should be greater than 0")
+        self.key = key
+        self.field = 1 if key == "src" else 0
+        self.capacity = capacity
+        self.window = window
+        self.slice = window / slices
+        self.slices = slices
+        self.frames = 0
+        self.bytes = 0
+        self.malformed = 0
+        # Newest frame.time_epoch seen: the clock of the window when the lines carry it
+        self.latest = None
+        self.bytes_by_mac = SpaceSaving(capacity)
+        self.frames_by_mac = SpaceSaving(capacity)
+        # (slice number, sketch of the bytes of the slice), oldest first
+        self.recent = deque()
+
+    def add_line(self, line, now=None):
+        """Adds a line (str or bytes). Frames without frame.time_epoch are timed with now (the current
+        time by default)."""
+        fields = line.split()
+        if len(fields) not in (3, 4):
+            self.malformed += len(fields) > 0
+            return
+        try:
+            length = int(fields[2])
+            timestamp = float(fields[3]) if len(fields) == 4 else (time.time() if now is None else now)
+        except ValueError:
+            self.malformed += 1
+            return
+        if len(fields) == 4 and (self.latest is None or timestamp > self.latest):
+            self.latest = timestamp
+        mac = fields[self.field]
+        self.add(mac.decode(errors="replace") if type(mac) is bytes else mac, length, timestamp)
+
+    def add(self, mac, length, timestamp):
+        self.frames += 1
+        self.bytes += length
+        self.bytes_by_mac.add(mac, length)
+        self.frames_by_mac.add(mac, 1)
+        number = int(timestamp // self.slice)
+        self.__expire(number)
+        # Late frames are added to the newest slice
+        if not self.recent or number > self.recent[-1][0]:
+            self.recent.append((number, SpaceSaving(self.capacity)))
+        self.recent[-1][1].add(mac, length)
+
+    def __expire(self, number):
+        while self.recent and self.recent[0][0] <= number - self.slices:
+            self.recent.popleft()
+
+    def now(self):
+        """Current time of the stream: the newest frame.time_epoch seen, so replayed or delayed captures
+        keep their own window, and the wall clock if the lines have no timestamps."""
+        return time.time() if self.latest is None else self.latest
+
+    def window_top(self, k=10, now=None):
+        """(mac, bytes) of the k MACs that sent (or received) most bytes in the last window seconds."""
+        self.__expire(int((self.now() if now is None else now) // self.slice))
+        totals = {}
+        get = totals.get
+        for _, sketch in self.recent:
+            for mac, v in sketch.counts.items():
+                totals[mac] = get(mac, 0) + v
+        return top(totals, k)
+
+    def snapshot(self, k=10, now=None):
+        """Summary of the stream so far as a dictionary that can be written as JSON."""
+        now = self.now() if now is None else now
+        frames = self.frames_by_mac.counts
+        return {"time": now, "frames": self.frames, "bytes": self.bytes, "malformed": self.malformed,
+                "key": self.key,
+                "top": [{"mac": mac, "bytes": v, "frames": frames.get(mac)} for mac, v in self.bytes_by_mac.top(k)],
+                "window": self.window,
+                "window top": [{"mac": mac, "bytes": v} for mac, v in self.window_top(k, now)]}
+
+
+def _read_stream(f, lines, tail, poll):
+    """Puts the lines of f in the queue lines and None at the end. With tail it waits for more lines at
+    the end of the file (like tail -f) instead of finishing."""
+    rest = ""
+    try:
+        while True:
+            line = f.readline()
+            if not line:
+                if not tail:
+                    break
+                time.sleep(poll)
+                continue
+            if not line.endswith("\n"):
+                # A line still being written
+                rest += line
+                if tail:
+                    continue
+                line = ""
+            lines.put(rest + line)
+            rest = ""
+        if rest:
+            lines.put(rest)
+    finally:
+        lines.put(None)
+
+
+def follow(f, aggregate, interval, emit, tail=False, poll=0.5):
+    """Feeds the lines of a text file (or stdin) to a LiveAggregate and calls emit with a snapshot every
+    interval seconds and when the input ends. The lines are read by another thread, so snapshots are
+    emitted even while no frames arrive."""
+    lines = queue.Queue(maxsize=65536)
+    threading.Thread(target=_read_stream, args=(f, lines, tail, poll), daemon=True).start()
+    next_emit = time.monotonic() + interval
+    while True:
+        try:
+            line = lines.get(timeout=max(0, next_emit - time.monotonic()))
+        except queue.Empty:
+            line = ""
+        if line is None:
+            break
+        if line:
+            aggregate.add_line(line)
+        if time.monotonic() >= next_emit:
+            emit(aggregate.snapshot())
+            next_emit += interval * max(1, int((time.monotonic() - next_emit) // interval) + 1)
+    emit(aggregate.snapshot())
@@ -0,0 +1,240 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://macvendors.co/api/vendorname/"
+# Default location of the persistent cache
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vendors.sqlite")
+# Known vendors are kept 30 days, unknown OUIs one day
+TTL = 30 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+
+
+class VendorLookupException(Exception):
+    pass
+
+
+class VendorCache:
+    """Vendor names by OUI, in an in-memory LRU backed by an optional sqlite file. Unknown OUIs are cached
+    too (as None) with a shorter TTL. Safe to share between threads."""
+
+    def __init__(self, filename=None, ttl=TTL, negative_ttl=NEGATIVE_TTL, memory_size=4096):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"memory hits": 0, "disk hits": 0, "misses": 0, "expired": 0}
+        self.db = None
+        if filename is not None:
+            try:
+                self.db = sqlite3.connect(filename, check_same_thread=False)
+                # It is only a cache, losing the last entries on a crash is better than a sync per entry
+                self.db.execute("PRAGMA synchronous = OFF")
+                self.db.execute("CREATE TABLE IF NOT EXISTS vendors (oui TEXT PRIMARY KEY, name TEXT, expires REAL)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                raise VendorLookupException(f"The vendor cache {filename} can not be opened ({e})")
+
+    def __remember(self, oui, name, expires):
+        self.memory[oui] = (name, expires)
+        self.memory.move_to_end(oui)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, oui):
+        """(True, name) if the OUI is cached (name is None for unknown OUIs), (False, None) otherwise."""
+        now = time.time()
+        with self.lock:
+            expired = False
+            entry = self.memory.get(oui)
+            if entry is not None:
+                if entry[1] > now:
+                    self.memory.move_to_end(oui)
+                    self.counters["memory hits"] += 1
+                    return True, entry[0]
+                del self.memory[oui]
+                expired = True
+            if self.db is not None:
+                try:
+                    row = self.db.execute("SELECT name, expires FROM vendors WHERE oui = ?", (oui,)).fetchone()
+                except sqlite3.Error:
+                    row = self.__drop_db()
+                if row is not None and row[1] > now:
+                    self.__remember(oui, row[0], row[1])
+                    self.counters["disk hits"] += 1
+                    return True, row[0]
+                expired = expired or row is not None
+            self.counters["misses"] += 1
+            self.counters["expired"] += expired
+            return False, None
+
+    def put(self, oui, name):
+        expires = time.time() + (self.ttl if name is not None else self.negative_ttl)
+        with self.lock:
+            self.__remember(oui, name, expires)
+            if self.db is not None:
+                try:
+                    self.db.execute("INSERT OR REPLACE INTO vendors VALUES (?, ?, ?)", (oui, name, expires))
+                    self.db.commit()
+                except sqlite3.Error:
+                    self.__drop_db()
+
+    def __drop_db(self):
+        # A read-only or broken file: from now on the cache is only kept in memory
+        self.db.close()
+        self.db = None
+
+    def stats(self):
+        with self.lock:
+            res = dict(self.counters)
+        lookups = res["memory hits"] + res["disk hits"] + res["misses"]
+        res["hit ratio"] = (res["memory hits"] + res["disk hits"]) / lookups if lookups else None
+        return res
+
+
+class RateLimiter:
+    """Spaces the calls to wait() so that, between all the threads sharing it, there are at most rate
+    per second. A rate of None or 0 means no limit."""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next, now)
+            self.next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class VendorClient:
+    """Looks vendors up in the macvendors API through a cache. It reuses the connections of one
+    requests.Session, gives up after timeout seconds and, when the API answers 429 (too many requests),
+    waits (Retry-After or an exponential backoff) before retrying. An optional RateLimiter paces every
+    request, retries included."""
+
+    def __init__(self, cache=None, url=API_URL, timeout=5, retries=3, backoff=1.0, pool_size=10,
+                 rate_limiter=None):
+        self.cache = cache if cache is not None else VendorCache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def __count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def fetch(self, oui):
+        """Asks the API without the cache. Returns the name or None if the vendor is unknown; raises
+        VendorLookupException if the API could not answer."""
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            self.__count("requests")
+            try:
+                response = self.session.get(self.url + oui, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.__count("errors")
+                raise VendorLookupException(f"The vendor of {oui} could not be obtained ({e})")
+            if response.status_code == 200:
+                return response.text
+            if response.status_code == 404:
+                return None
+            if response.status_code != 429:
+                self.__count("errors")
+                raise VendorLookupException(f"The vendor API answered {response.status_code} for {oui}")
+            self.__count("throttled")
+            if attempt < self.retries:
+                try:
+                    wait = float(response.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    wait = self.backoff * 2 ** attempt
+                time.sleep(wait)
+        self.__count("errors")
+        raise VendorLookupException(f"The vendor API is still throttling after {self.retries} retries")
+
+    def lookup(self, oui):
+        """Vendor name of an OUI (xx:xx:xx), None if it is unknown. Errors are not cached."""
+        found, name = self.cache.get(oui)
+        if found:
+            return name
+        name = self.fetch(oui)
+        self.cache.put(oui, name)
+        return name
+
+    def lookup_many(self, ouis, workers=8):
+        """Looks many OUIs up, each one once. The ones not in the cache are fetched concurrently by a pool
+        of workers threads (pool_size should be at least workers so every thread keeps its connection).
+        Returns ({oui: name}, {oui: error message}) for the OUIs that could and could not be resolved."""
+        names, errors, pending = {}, {}, []
+        for oui in set(ouis):
+            found, name = self.cache.get(oui)
+            if found:
+                names[oui] = name
+            else:
+                pending.append(oui)
+        if not pending:
+            return names, errors
+
+        def resolve(oui):
+            try:
+                name = self.fetch(oui)
+            except VendorLookupException as e:
+                return oui, None, str(e)
+            self.cache.put(oui, name)
+            return oui, name, None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            for oui, name, error in pool.map(resolve, pending):
+                if error is None:
+                    names[oui] = name
+                else:
+                    errors[oui] = error
+        return names, errors
+
+    def stats(self):
+        with self.lock:
+            res = dict(self.counters)
+        res.update(self.cache.stats())
+        return res
+
+
+def default_cache():
+    """Cache stored at DEFAULT_CACHE (a new connection on every call). If it can not be created there, for
+    instance because the directory is not writable, the cache is only kept in memory."""
+    try:
+        os.makedirs(os.path.dirname(DEFAULT_CACHE), exist_ok=True)
+        return VendorCache(DEFAULT_CACHE)
+    except (OSError, VendorLookupException):
+        return VendorCache()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Client with the persistent cache at DEFAULT_CACHE, created once."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = VendorClient(default_cache())
+    return _default
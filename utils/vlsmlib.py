@@ -0,0 +1,146 @@
+import sys
+import heapq
+sys.path.append('..')
+from utils import netlib
+
+
+class VLSMException(Exception):
+    pass
+
+
+def prefix_for_hosts(hosts):
+    """Longest prefix whose networks have room for hosts (plus the network id and the broadcast)."""
+    if type(hosts) is not int or hosts < 1:
+        raise VLSMException("The number of hosts of a segment should be greater than 0")
+    return 32 - (hosts + 1).bit_length()
+
+
+class VLSMPlan():
+    """Subnets of a parent network assigned with a buddy allocator.
+
+    Free blocks are kept per prefix length (a set for membership and a heap to take the lowest one).
+    A segment takes the lowest free block of the longest prefix that fits it, splitting bigger blocks
+    in halves when needed, and a released block is merged with its buddy while the buddy is free, so
+    each operation costs at most one step per prefix length.
+    """
+
+    def __init__(self, parent):
+        if type(parent) is not netlib.Network:
+            raise VLSMException("The parent should be a netlib.Network")
+        self.parent = parent
+        self.free = {parent.prefix: {parent.netid.number}}
+        self.heaps = {parent.prefix: [parent.netid.number]}
+        # name -> (hosts, network)
+        self.segments = {}
+
+    def __push_free(self, prefix, netid):
+        self.free.setdefault(prefix, set()).add(netid)
+        heapq.heappush(self.heaps.setdefault(prefix, []), netid)
+
+    def __pop_free(self, prefix):
+        heap = self.heaps.get(prefix, [])
+        free = self.free.get(prefix, set())
+        while heap:
+            netid = heapq.heappop(heap)
+            if netid in free:
+                free.remove(netid)
+                return netid
+        return None
+
+    def __allocate(self, prefix):
+        for level in range(prefix, self.parent.prefix - 1, -1):
+            netid = self.__pop_free(level)
+            if netid is None:
+                continue
+            # Keep the lower half and leave the upper one free until the block has the wanted size
+            while level < prefix:
+                level += 1
+                self.__push_free(level, netid + (1 << (32 - level)))
+            return netid
+        return None
+
+    def add(self, name, hosts):
+        """Assigns the smallest subnet with room for hosts. Returns its netlib.Network."""
+        if name in self.segments:
+            raise VLSMException(f"There is already a segment called {name}")
+        prefix = prefix_for_hosts(hosts)
+        if prefix < self.parent.prefix:
+            raise VLSMException(f"{name} ({hosts} hosts) does not fit in {self.parent}")
+        netid = self.__allocate(prefix)
+        if netid is None:
+            raise VLSMException(f"There is no room left in {self.parent} for {name} ({hosts} hosts)")
+        net = netlib.Network(netid, prefix)
+        self.segments[name] = (hosts, net)
+        return net
+
+    def release(self, name):
+        """Frees the subnet of a segment, merging it with its free buddies."""
+        if name not in self.segments:
+            raise VLSMException(f"There is no segment called {name}")
+        _, net = self.segments.pop(name)
+        netid, prefix = net.netid.number, net.prefix
+        while prefix > self.parent.prefix:
+            buddy = netid ^ (1 << (32 - prefix))
+            free = self.free.get(prefix, set())
+            if buddy not in free:
+                break
+            free.remove(buddy)
+            netid &= ~(1 << (32 - prefix))
+            prefix -= 1
+        self.__push_free(prefix, netid)
+
+    def free_addresses(self):
+        return sum(len(v) << (32 - k) for k, v in self.free.items())
+
+    def to_dict(self):
+        return {"network": str(self.parent),
+                "segments": [{"name": name, "hosts": hosts, "network": str(net)}
+                             for name, (hosts, net) in self.segments.items()]}
+
+    @classmethod
+    def from_dict(cls, info):
+        """Rebuilds a plan keeping the subnet of every segment."""
+        try:
+            ip, prefix = info["network"].split("/")
+            res = cls(netlib.Network(ip, int(prefix)))
+            segments = sorted(info["segments"], key=lambda s: int(s["network"].split("/")[1]))
+            # Taking the biggest subnets first, each one is still a whole free block when its turn comes
+            for s in segments:
+                res.__take(s["name"], s["hosts"], s["network"])
+        except (KeyError, ValueError, AttributeError, TypeError):
+            raise VLSMException("The plan is not valid")
+        except netlib.NetworkException as e:
+            raise VLSMException(f"The plan is not valid ({e})")
+        return res
+
+    def __take(self, name, hosts, network):
+        ip, prefix = network.split("/")
+        net = netlib.Network(ip, int(prefix))
+        if name in self.segments or prefix_for_hosts(hosts) < net.prefix:
+            raise VLSMException(f"The plan is not valid ({name})")
+        netid = net.netid.number
+        # Split the free block containing the subnet until the subnet itself is free
+        for level in range(net.prefix, self.parent.prefix - 1, -1):
+            block = netid & ((0xffffffff << (32 - level)) & 0xffffffff)
+            if block in self.free.get(level, set()):
+                break
+        else:
+            raise VLSMException(f"The plan is not valid ({name} overlaps other segment)")
+        self.free[level].remove(block)
+        while level < net.prefix:
+            level += 1
+            half = 1 << (32 - level)
+            if netid & half:
+                self.__push_free(level, block)
+                block += half
+            else:
+                self.__push_free(level, block + half)
+        self.segments[name] = (hosts, net)
+
+
+def plan(parent, segments):
+    """Plans a list of (name, hosts) in parent, the biggest segments first as usual in VLSM."""
+    res = VLSMPlan(parent)
+    for name, hosts in sorted(segments, key=lambda s: s[1], reverse=True):
+        res.add(name, hosts)
+    return res